@@ -1,3 +1,4 @@
+import sys
 from abc import ABC
 from copy import deepcopy
 
@@ -7,37 +8,48 @@ from coc.exceptions import ImmutablePropertyError, SchemaError
 class COCClass(ABC):
     """ Common base class for all CoC module classes
     """
+    __slots__ = ()
 
 
 class Immutable(COCClass):
     """ Common base class for CoC subclasses that have properties which are
     immutable after being initialized (i.e. most of them)
+    World objects are numerous, so subclasses should declare ``__slots__``
+    for their attributes. Attributes named in ``mutable`` may still be set
+    after initialization.
     """
+    __slots__ = ('initialized',)
+    mutable = ()
+
     def __init__(self):
-        self.initialized = False
-        self.mutable = list()
-        super().__setattr__('initialized', False)
-        self.immutable = list()
+        object.__setattr__(self, 'initialized', False)
 
     def __setattr__(self, key, value):
-        try:
-            if self.initialized and key not in self.mutable:
-                raise ImmutablePropertyError(self.__class__.__name__, key)
-            else:
-                super().__setattr__(key, value)
-        except AttributeError:
-            super().__setattr__(key, value)
+        if self.initialized and key not in self.mutable:
+            raise ImmutablePropertyError(self.__class__.__name__, key)
+        object.__setattr__(self, key, value)
+
+    def __setstate__(self, state):
+        # unpickling must bypass the immutability check, and some subclasses
+        # shadow ``__dict__`` so the default update of it can't be used.
+        # slotted classes are pickled as a (__dict__, slots) pair.
+        if isinstance(state, tuple):
+            state = dict(state[0] or {}, **state[1])
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
 
 
 class EventContext(Immutable):
     """ Common base class for world objects that have events associated with
     them. Used mainly to handle event loading.
     """
+    __slots__ = ('state', 'id_', 'name')
+
     def __init__(self, schema):
         super().__init__()
         self.state = {}
         try:
-            self.id_ = schema['id']
+            self.id_ = sys.intern(schema['id'])
         except KeyError:
             raise SchemaError("{0} schema missing required field ``id``"
                               .format(type(self)), schema=schema)
@@ -49,3 +61,16 @@ class EventContext(Immutable):
 
     def get_state_template(self):
         return deepcopy(self.state)
+
+    def get_references(self):
+        """ Returns the event streams registered to this context in its
+        initial state, as ``(type, id)`` pairs.
+        """
+        references = [('event_stream', id_)
+                      for id_ in self.state.get('events', [])]
+        for key in ['encounter_event_id', 'victory_event_id',
+                    'defeat_event_id']:
+            if key in self.state and \
+                    ('event_stream', self.state[key]) not in references:
+                references.append(('event_stream', self.state[key]))
+        return references
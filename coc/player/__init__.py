@@ -1,8 +1,18 @@
 import yaml
 import os
+import copy
+import functools
+import time
 
 from coc import COCClass
-from coc.exceptions import StateNotFoundError
+from coc.exceptions import LoadError, StateNotFoundError
+from coc.player import journal as journallib
+from coc.player.eventindex import EventIndex
+from coc.player.memo import ConditionMemo
+from coc.player import savefile
+from coc.player.statepath import StatePath, compile_path
+from coc.player.statestore import StateStore
+from coc.world.symbols import SymbolTable
 
 
 class Player(COCClass):
@@ -11,50 +21,196 @@ class Player(COCClass):
     Should deal only with state tracking and persistence. All runtime logic
     should be kept in other classes.
     """
-    def __init__(self, name, world_id, state, meta):
+    def __init__(self, name, world_id, state, meta, symbols=None):
+        """ ``state`` is the nested state dict of the game, which is kept in
+        a StateStore laid out by the world's SymbolTable ``symbols``. Without
+        one, the layout is derived from ``state`` itself.
+        """
         super().__init__()
-        self.meta = meta
+        # saves from before meta data was kept hold None
+        self.meta = dict(meta or {})
         self.name = name
         self.world_id = world_id
-        self.state = state
+        # players without a world's symbols have a layout of their own
+        self.standalone = symbols is None
+        if symbols is None:
+            symbols = SymbolTable(state)
+        self.state = StateStore.from_dict(symbols, state)
         self.current_locale = None
+        # changes since the last save, and the journal that continues the
+        # snapshot last saved, if it was saved with a journal
+        self.changes = list()
+        # when the first of those changes was made
+        self.changed_at = None
+        self.journal_file = None
+        self.journal_length = 0
+        # whether the state was rolled back since the last save, so that the
+        # changes no longer lead on from it
+        self.rolled_back = False
+        self.conditions = ConditionMemo()
+        # where each event stream is registered, built on first use
+        self.events = None
+        self.session_start = time.monotonic()
+
+    def get_playtime(self):
+        """ Returns the seconds played in this game, over all sessions.
+        """
+        return self.meta.get('playtime', 0.0) + \
+            time.monotonic() - self.session_start
 
     def get_state(self, state_path):
-        path_tokens = state_path.split('.')
-        scope = self.state
-        resolved = list()
-        for token in path_tokens:
-            try:
-                resolved.append(token)
-                scope = scope[token]
-            except KeyError:
-                raise StateNotFoundError(
-                        msg="unable to resolve state path ``{0}``"
-                            .format('.'.join(resolved)),
-                        found=resolved[0:-1],
-                        requested=state_path,
-                        error=resolved[-1])
-        if type(scope) == dict:
-            raise StateNotFoundError(
-                    msg="incomplete state path ``{0}`` - result is not a "
-                        "single state element".format('.'.join(resolved)))
+        """ Returns the state element at ``state_path``, which is either a
+        dotted path string or a StatePath compiled from one.
+        """
+        if type(state_path) is not StatePath:
+            state_path = compile_path(state_path)
         # TODO: figure out how to return a copy of this state so it is not
         # modifiable
-        return scope
+        return self.state.get(state_path)
 
     def set_state(self, state_path, value):
-        # TODO: factor out the state resolution algorithm in get_state() above
-        # into a private helper method that returns a shallow-copied reference
-        # to the target state, and then modify it
-        pass
+        """ Sets the state element at ``state_path``, which is either a
+        dotted path string or a StatePath compiled from one, to ``value``.
+        """
+        if type(state_path) is not StatePath:
+            state_path = compile_path(state_path)
+        registers = state_path.key == 'events' and \
+            len(state_path.tokens) == 4 and state_path.tokens[0] == 'world'
+        if registers:
+            if value is not None and (
+                    type(value) not in (list, tuple) or
+                    not all(type(id_) is str for id_ in value)):
+                raise StateNotFoundError(
+                    msg="cannot store ``{0!r}`` in ``{1}``, which lists "
+                        "event stream ids".format(value, state_path.path))
+            registered = None
+            if self.events is not None:
+                registered = self._registered(state_path)
+        self.state.set(state_path, value)
+        # the index only follows the state once it has changed
+        if registers and self.events is not None:
+            self.events.update(state_path.tokens[1:3], registered, value)
+        self.conditions.invalidate(state_path.path)
+        if not self.changes:
+            self.changed_at = time.monotonic()
+        self.changes.append((state_path.path, value))
 
-    def save(self, save_file):
+    def snapshot(self):
+        """ Returns a copy of this player that can be saved while play goes
+        on, e.g. on another thread. It takes over the changes made since the
+        last save, so the copy should be saved next. The state is shared
+        until either of them changes it.
+        """
+        snapshot = copy.copy(self)
+        snapshot.state = self.state.snapshot()
+        snapshot.meta = dict(self.meta, playtime=self.get_playtime())
+        snapshot.session_start = time.monotonic()
+        self.changes = list()
+        self.rolled_back = False
+        return snapshot
+
+    def checkpoint(self):
+        """ Returns a checkpoint of this player's game, which restore() rolls
+        back to. Taking one doesn't copy any state.
+        """
+        return self.state.snapshot(), self.current_locale
+
+    def restore(self, checkpoint):
+        """ Rolls the game back to a checkpoint. The next save is a snapshot
+        of the whole state, as a journal can't be rolled back.
+        """
+        state, self.current_locale = checkpoint
+        # the checkpoint may be restored again
+        self.state = state.snapshot()
+        self.conditions.clear()
+        self.events = None
+        self.rolled_back = True
+
+    def rebind(self, world):
+        """ Moves this player's state to the layout of the SymbolTable of
+        ``world``, e.g. after the world it plays was reloaded, and records
+        the world's id and object hashes as the ones it is played in.
+        """
+        if self.world_id != world.get_id():
+            self.world_id = world.get_id()
+            self.meta['world_objects'] = world.get_object_hashes()
+        symbols = world.symbols
+        if symbols is not self.state.symbols:
+            self.state = StateStore.from_dict(symbols, self.state.to_dict())
+            self.conditions.clear()
+            self.events = None
+            self.standalone = False
+
+    def event_contexts(self, event_id):
+        """ Returns the ``(type, id)`` of every world object whose events
+        currently register the event stream ``event_id``.
+        """
+        if self.events is None:
+            events = EventIndex(self.state.symbols)
+            # only the world objects this player changed can differ from
+            # the world's registrations
+            for scope_tokens in self.state.changed_scopes():
+                if len(scope_tokens) == 3 and scope_tokens[0] == 'world':
+                    events_path = compile_path(
+                        '.'.join(scope_tokens + ('events',)))
+                    events.update(scope_tokens[1:],
+                                  self.state.default(events_path),
+                                  self._registered(events_path))
+            self.events = events
+        return self.events.contexts(event_id)
+
+    def _registered(self, events_path):
+        try:
+            return self.state.get(events_path)
+        except StateNotFoundError:
+            return None
+
+    def save(self, save_file, journal=False, binary=False):
         """ Serialize all internal state and write to the given save path.
+        With ``journal``, only the changes since the last save are appended
+        to a journal next to the save file, as long as that save was made
+        the same way; the journal is compacted into a new snapshot of the
+        whole state every journal.JOURNAL_LIMIT changes.
+        Snapshots are written as YAML, or in the sectioned binary format of
+        coc.player.savefile with ``binary``.
         """
         if not save_file.endswith('csf'):
             save_file = save_file + os.extsep + 'csf'
-        with open(save_file, 'w+') as file:
-            file.write(self._serialize())
+        journal_file = journallib.journal_path(save_file)
+        if journal and self.journal_file == journal_file and \
+                not self.rolled_back and \
+                self.journal_length + len(self.changes) <= \
+                journallib.JOURNAL_LIMIT:
+            try:
+                journallib.append(journal_file, self.changes,
+                                  self.meta.get('generation'),
+                                  start=self.journal_length == 0)
+                self.journal_length += len(self.changes)
+                self.changes = list()
+                return
+            except (TypeError, ValueError):
+                # values JSON can't hold still fit in a snapshot
+                pass
+        self.meta['playtime'] = self.get_playtime()
+        self.session_start = time.monotonic()
+        # the journal of the snapshot this replaces is stale once the new
+        # one is written, even if a crash keeps it from being removed
+        self.meta['generation'] = (self.meta.get('generation') or 0) + 1
+        if binary:
+            savefile.write(save_file, *self._save_data())
+        else:
+            tmp_file = save_file + os.extsep + 'tmp'
+            with open(tmp_file, 'w') as file:
+                file.write(self._serialize())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_file, save_file)
+        # the snapshot includes everything journaled so far
+        journallib.clear(journal_file)
+        self.changes = list()
+        self.rolled_back = False
+        self.journal_file = journal_file if journal else None
+        self.journal_length = 0
 
     def visit(self, locale: str):
         """
@@ -63,8 +219,54 @@ class Player(COCClass):
         :return:
         """
         self.current_locale = locale
-        return self.get_state('world.locale.{0}.events'.format(locale))
+        return self.get_state(locale_events_path(locale))
+
+    def to_bytes(self):
+        """ Returns this player as a binary save, e.g. to be kept in a
+        database.
+        """
+        self.meta['playtime'] = self.get_playtime()
+        self.session_start = time.monotonic()
+        return savefile.encode(*self._save_data())
+
+    def _header(self):
+        """ Returns what a save browser needs to know about this game.
+        """
+        return {
+            'name': self.name,
+            'world_id': self.world_id,
+            'current_locale': self.current_locale,
+            'playtime': self.meta['playtime'],
+        }
 
+    def _save_data(self):
+        """ Returns the header and sections of a binary save. The sections
+        hold the meta data, and the state of the top level scopes and the
+        world objects the player changed, keyed by their dotted scope path.
+        Unless the player is standalone, each only holds what differs from
+        the world's defaults, which are applied again on load; scopes left
+        out are at their defaults.
+        """
+        sections = {'meta': self.meta}
+        # scopes that can't be stored as deltas
+        whole = list()
+        if self.standalone:
+            # nothing else knows this player's defaults
+            scopes = self.state.all_scopes() | {('pc',), ('game',)}
+            for scope_tokens in sorted(scopes):
+                sections['.'.join(scope_tokens)] = \
+                    self.state.scope_dict(scope_tokens)
+        else:
+            for scope_tokens in sorted(self.state.changed_scopes()):
+                name = '.'.join(scope_tokens)
+                delta = self.state.scope_delta(scope_tokens)
+                if delta is None:
+                    whole.append(name)
+                    sections[name] = self.state.scope_dict(scope_tokens)
+                elif delta:
+                    sections[name] = delta
+        header = dict(self._header(), delta=not self.standalone, whole=whole)
+        return header, sections
 
     def _serialize(self):
         """ returns a string that represents the internal state of self,
@@ -73,14 +275,82 @@ class Player(COCClass):
         save = dict()
         save['name'] = self.name
         save['world_id'] = self.world_id
-        save['state'] = self.state
+        save['state'] = self.state.to_dict()
         save['meta'] = self.meta
         return yaml.safe_dump(save)
 
 
-def load(save_file):
+def locale_events_path(locale):
+    """ Returns the compiled path of the events registered to a locale.
+    """
+    return compile_path('world.locale.{0}.events'.format(locale))
+
+
+def load(save_file, symbols=None):
     """ A factory function that loads a Player object from a file path.
+    ``symbols`` is the SymbolTable of the world the player will play.
+    Binary saves only decode the state of world objects when it is first
+    accessed.
+    """
+    if savefile.is_binary(save_file):
+        player = _load_binary(*savefile.read(save_file), symbols)
+    else:
+        with open(save_file, 'r') as file:
+            player = yaml.safe_load(file.read())
+        player = Player(symbols=symbols, **player)
+    journal_file = journallib.journal_path(save_file)
+    changes, complete, generation = journallib.read(journal_file)
+    if changes and generation != player.meta.get('generation'):
+        # left over from an older snapshot by a crash during compaction;
+        # the next save starts a new journal
+        changes, complete = list(), False
+    for state_path, value in changes:
+        try:
+            player.set_state(state_path, value)
+        except StateNotFoundError as e:
+            raise LoadError("unable to replay the save journal ``{0}``: {1}"
+                            .format(journal_file, str(e)))
+    player.changes = list()
+    if complete:
+        player.journal_file = journal_file
+        player.journal_length = len(changes)
+    return player
+
+
+def from_bytes(data, symbols=None):
+    """ Returns the Player in a binary save made by Player.to_bytes().
     """
-    with open(save_file, 'r') as file:
-        player = yaml.safe_load(file.read())
-    return Player(**player)
+    return _load_binary(*savefile.parse(data), symbols)
+
+
+def _load_binary(header, sections, symbols):
+    meta = savefile.decode(sections.pop('meta'))
+    if header.get('delta'):
+        if symbols is None:
+            raise LoadError("the save of ``{0}`` only holds changes to its "
+                            "world, so it must be loaded with the world"
+                            .format(header['name']))
+        player = Player(header['name'], header['world_id'], dict(), meta,
+                        symbols)
+        for name, section in sections.items():
+            player.state.defer(tuple(name.split('.')),
+                               functools.partial(savefile.decode, section),
+                               delta=name not in header['whole'])
+        player.current_locale = header['current_locale']
+        return player
+    state = {name: savefile.decode(sections.pop(name))
+             for name in ['pc', 'game'] if name in sections}
+    if symbols is None:
+        # the layout is derived from the save, so it must be decoded whole
+        for name, section in sections.items():
+            scope = state
+            for token in name.split('.'):
+                scope = scope.setdefault(token, dict())
+            scope.update(savefile.decode(section))
+        sections = dict()
+    player = Player(header['name'], header['world_id'], state, meta, symbols)
+    for name, section in sections.items():
+        player.state.defer(tuple(name.split('.')),
+                           functools.partial(savefile.decode, section))
+    player.current_locale = header['current_locale']
+    return player
@@ -0,0 +1,66 @@
+import weakref
+
+from coc import COCClass
+
+# the event registrations of each world's defaults, by SymbolTable
+_defaults = weakref.WeakKeyDictionary()
+
+
+class EventIndex(COCClass):
+    """ Maps each event stream to the world objects whose ``events`` list
+    registers it in one player's state, as ``(type, id)`` pairs. The
+    registrations of the world's defaults are shared by all players of the
+    world; a player only keeps its own copy of the entries of event streams
+    whose registrations it changed.
+    """
+    __slots__ = ('defaults', 'changed')
+
+    def __init__(self, symbols):
+        self.defaults = default_contexts(symbols)
+        self.changed = dict()
+
+    def contexts(self, event_id):
+        """ Returns the ``(type, id)`` of every world object that registers
+        the event stream ``event_id``.
+        """
+        contexts = self.changed.get(event_id)
+        if contexts is None:
+            contexts = self.defaults.get(event_id, frozenset())
+        return contexts
+
+    def update(self, context, old, new):
+        """ Records that the ``events`` list of the world object ``context``
+        changed from ``old`` to ``new``.
+        """
+        old = set(old or ())
+        new = set(new or ())
+        for event_id in old - new:
+            self._own(event_id).discard(context)
+        for event_id in new - old:
+            self._own(event_id).add(context)
+
+    def _own(self, event_id):
+        contexts = self.changed.get(event_id)
+        if contexts is None:
+            contexts = self.changed[event_id] = set(
+                self.defaults.get(event_id, ()))
+        return contexts
+
+
+def default_contexts(symbols):
+    """ Returns the event registrations of the defaults of a SymbolTable, as
+    a dict of frozensets of ``(type, id)`` by event stream id.
+    """
+    contexts = _defaults.get(symbols)
+    if contexts is None:
+        index = dict()
+        for type_, objects in symbols.base.get('world', dict()).items():
+            for id_, scope in objects.items():
+                if type(scope) != dict:
+                    continue
+                for event_id in scope.get('events') or ():
+                    index.setdefault(event_id, set()).add((type_, id_))
+        contexts = _defaults[symbols] = {
+            event_id: frozenset(registered)
+            for event_id, registered in index.items()}
+    return contexts
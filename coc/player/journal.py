@@ -0,0 +1,65 @@
+import json
+import os
+
+# the number of journaled changes after which a save is compacted into a new
+# snapshot, so that loading never replays an unbounded journal
+JOURNAL_LIMIT = 1000
+
+
+def journal_path(save_file):
+    """ Returns the path of the journal kept next to a save file.
+    """
+    return save_file + os.extsep + 'journal'
+
+
+def append(journal_file, changes, generation=None, start=False):
+    """ Appends ``(state_path, value)`` changes to a journal, one JSON line
+    each, and makes sure they are on disk before returning. With ``start``,
+    a new journal is started instead, continuing the snapshot of the
+    ``generation`` given. Raises TypeError or ValueError, without writing
+    anything, if a value can't be journaled.
+    """
+    entries = ''.join(json.dumps([path, value]) + '\n'
+                      for path, value in changes)
+    if start:
+        entries = json.dumps({'generation': generation}) + '\n' + entries
+    with open(journal_file, 'w' if start else 'a') as file:
+        file.write(entries)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def read(journal_file):
+    """ Returns the ``(state_path, value)`` changes in a journal, oldest
+    first, whether the journal ended cleanly, and the generation of the
+    snapshot it continues (None for journals that don't say). A torn last
+    entry, as left by a crash during append(), is dropped; the journal should
+    then be compacted before anything is appended to it again.
+    """
+    changes = list()
+    generation = None
+    try:
+        file = open(journal_file, 'r')
+    except FileNotFoundError:
+        return changes, True, generation
+    with file:
+        for line in file:
+            try:
+                if not line.endswith('\n'):
+                    raise ValueError(line)
+                entry = json.loads(line)
+                if type(entry) == dict and not changes:
+                    generation = entry['generation']
+                    continue
+                path, value = entry
+            except (ValueError, TypeError, KeyError):
+                return changes, False, generation
+            changes.append((path, value))
+    return changes, True, generation
+
+
+def clear(journal_file):
+    try:
+        os.remove(journal_file)
+    except FileNotFoundError:
+        pass
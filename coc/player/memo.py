@@ -0,0 +1,39 @@
+from coc import COCClass
+
+
+class ConditionMemo(COCClass):
+    """ Caches the results of a player's compiled conditions. A result stays
+    cached until one of the state paths its condition reads is set, so
+    conditions aren't tested again between changes to their state.
+    """
+    __slots__ = ('results', 'readers')
+
+    def __init__(self):
+        # results by condition id, and the cached conditions reading each
+        # state path
+        self.results = dict()
+        self.readers = dict()
+
+    def test(self, condition, state_func):
+        """ Returns whether a conditional.CompiledCondition holds.
+        """
+        result = self.results.get(condition.id_)
+        if result is None:
+            result = self.results[condition.id_] = \
+                bool(condition.test(state_func))
+            for path in condition.paths:
+                self.readers.setdefault(path, list()).append(condition.id_)
+        return result
+
+    def invalidate(self, path):
+        """ Forgets the results of the conditions reading the dotted state
+        path ``path``.
+        """
+        readers = self.readers.pop(path, None)
+        if readers:
+            for id_ in readers:
+                self.results.pop(id_, None)
+
+    def clear(self):
+        self.results = dict()
+        self.readers = dict()
@@ -0,0 +1,116 @@
+import json
+import os
+import struct
+import zlib
+
+from coc.exceptions import LoadError
+
+MAGIC = b'CSFB'
+# bumped whenever the layout of the header or the sections changes
+SAVE_VERSION = 1
+
+# magic, format version, and the length of the header that follows
+_prefix = struct.Struct('<4sHI')
+
+
+def is_binary(save_file):
+    """ Returns whether ``save_file`` is in the binary save format, rather
+    than YAML.
+    """
+    with open(save_file, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def encode(header, sections):
+    """ Returns a binary save: a small ``header`` dict, e.g. for a save
+    browser, followed by named sections of state. ``sections`` maps section
+    names to values, which are encoded as JSON independently so that each
+    can be decoded only when needed. The sections are compressed together
+    with zlib.
+    """
+    blobs = list()
+    index = list()
+    offset = 0
+    for name, value in sections.items():
+        blob = _dumps(value)
+        index.append((name, offset, len(blob)))
+        blobs.append(blob)
+        offset += len(blob)
+    header = _dumps(dict(header, sections=index))
+    return b''.join([_prefix.pack(MAGIC, SAVE_VERSION, len(header)), header,
+                     zlib.compress(b''.join(blobs), 1)])
+
+
+def write(save_file, header, sections):
+    """ Writes a binary save made by encode() to ``save_file``, replacing it
+    atomically.
+    """
+    data = encode(header, sections)
+    tmp_file = save_file + os.extsep + 'tmp'
+    with open(tmp_file, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_file, save_file)
+
+
+def read_header(save_file):
+    """ Returns the header of a binary save, without reading its sections.
+    """
+    with open(save_file, 'rb') as file:
+        header = _read_header(file.read(_prefix.size), file.read,
+                              save_file)[0]
+    del header['version']
+    return header
+
+
+def read(save_file):
+    """ Returns the header of a binary save and a dict of its sections, each
+    still encoded; pass them to decode() when they are needed.
+    """
+    with open(save_file, 'rb') as file:
+        return parse(file.read(), save_file)
+
+
+def parse(data, source='<save>'):
+    """ Like read(), for a binary save made by encode().
+    """
+    data = memoryview(data)
+    header, length = _read_header(
+        data[:_prefix.size], lambda length: data[_prefix.size:][:length],
+        source)
+    del header['version']
+    try:
+        body = memoryview(zlib.decompress(data[_prefix.size + length:]))
+    except zlib.error as e:
+        raise LoadError("``{0}`` is corrupted".format(source)) from e
+    sections = {name: body[offset:offset + length]
+                for name, offset, length in header['sections']}
+    return header, sections
+
+
+def decode(section):
+    return json.loads(bytes(section))
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+def _read_header(prefix, read, save_file):
+    """ Returns the header of a binary save and its encoded length, given
+    the prefix of the save and a function that reads on from it. The format
+    version of the save is added to the header.
+    """
+    try:
+        magic, version, length = _prefix.unpack(prefix)
+        if magic != MAGIC:
+            raise LoadError("``{0}`` is not a binary save".format(save_file))
+        if version != SAVE_VERSION:
+            raise LoadError("``{0}`` is a version {1} save, but only version "
+                            "{2} is supported".format(save_file, version,
+                                                      SAVE_VERSION))
+        header = json.loads(bytes(read(length)))
+        return dict(header, version=version), length
+    except (struct.error, ValueError, TypeError) as e:
+        raise LoadError("``{0}`` is corrupted".format(save_file)) from e
@@ -0,0 +1,261 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import abstractmethod
+
+import yaml
+
+from coc import COCClass
+from coc import player as playerlib
+from coc.exceptions import LoadError
+from coc.player import savefile
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory locks on this platform
+    fcntl = None
+
+
+class SaveStore(COCClass):
+    """ Common base class for the places players are saved in. Saves are
+    identified by player name, and described by a header dict with the
+    ``name``, ``world_id``, ``current_locale`` and ``playtime`` of the game.
+    """
+    @abstractmethod
+    def list(self, after=None, limit=None):
+        """ Returns the headers of the saves whose names sort after
+        ``after``, by name, at most ``limit`` of them.
+        """
+
+    @abstractmethod
+    def count(self):
+        pass
+
+    @abstractmethod
+    def exists(self, name):
+        pass
+
+    @abstractmethod
+    def load(self, name, symbols=None):
+        """ Returns the saved Player called ``name``, with its state laid out
+        by the SymbolTable ``symbols``.
+        """
+
+    @abstractmethod
+    def save(self, player):
+        pass
+
+    def close(self):
+        pass
+
+
+class FileSaveStore(SaveStore):
+    """ Keeps each player in a ``.csf`` file in a directory, indexed by a
+    ``saves.yaml`` that maps player names to save files. The index is
+    rewritten atomically, under a lock where the platform supports it.
+    """
+    def __init__(self, save_path, journal=False, binary=True):
+        super().__init__()
+        self.save_path = save_path
+        self.index_file = os.path.join(save_path, 'saves.yaml')
+        self.journal = journal
+        self.binary = binary
+        os.makedirs(save_path, exist_ok=True)
+
+    def list(self, after=None, limit=None):
+        index = self._read_index()
+        names = sorted(name for name in index
+                       if after is None or name > after)[:limit]
+        return [self._header(name, index[name]) for name in names]
+
+    def count(self):
+        return len(self._read_index())
+
+    def exists(self, name):
+        return name in self._read_index()
+
+    def load(self, name, symbols=None):
+        try:
+            save_file = self._read_index()[name]
+        except KeyError:
+            raise LoadError("there is no save called ``{0}``".format(name))
+        return playerlib.load(save_file, symbols)
+
+    def save(self, player):
+        save_file = self._read_index().get(player.name)
+        if save_file is None:
+            save_file = os.path.join(self.save_path,
+                                     player.name + os.extsep + 'csf')
+            player.save(save_file, journal=self.journal, binary=self.binary)
+            with self._lock():
+                index = self._read_index()
+                index.setdefault(player.name, save_file)
+                self._write_index(index)
+        else:
+            player.save(save_file, journal=self.journal, binary=self.binary)
+
+    def _header(self, name, save_file):
+        header = dict()
+        try:
+            if savefile.is_binary(save_file):
+                header = savefile.read_header(save_file)
+        except (OSError, LoadError):
+            pass
+        return {'name': name, 'world_id': header.get('world_id'),
+                'current_locale': header.get('current_locale'),
+                'playtime': header.get('playtime')}
+
+    def _read_index(self):
+        try:
+            with open(self.index_file, 'r') as file:
+                return yaml.safe_load(file.read()) or dict()
+        except FileNotFoundError:
+            return dict()
+        except yaml.YAMLError as e:
+            raise LoadError("Unable to load your saves.\n"
+                            "saves.yaml is corrupted!") from e
+
+    def _write_index(self, index):
+        tmp_file = self.index_file + os.extsep + 'tmp'
+        with open(tmp_file, 'w') as file:
+            file.write(yaml.safe_dump(index))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_file, self.index_file)
+
+    def _lock(self):
+        return _FileLock(self.index_file + os.extsep + 'lock')
+
+
+class SQLiteSaveStore(SaveStore):
+    """ Keeps players in an SQLite database, one row per player holding its
+    binary save along with the columns of its header. Names are the primary
+    key, so lookups and pages of the save menu are index seeks, and the
+    database runs in WAL mode so that any number of processes can read it
+    while one writes.
+    """
+    def __init__(self, db_file):
+        super().__init__()
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        # connections can't be shared between threads, e.g. with autosaves
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS players ('
+                'name TEXT PRIMARY KEY, world_id TEXT, current_locale TEXT, '
+                'playtime REAL, saved_at REAL, save BLOB)')
+
+    def list(self, after=None, limit=None):
+        rows = self._connection().execute(
+            'SELECT name, world_id, current_locale, playtime FROM players '
+            'WHERE name > ? ORDER BY name LIMIT ?',
+            ('' if after is None else after, -1 if limit is None else limit))
+        return [{'name': name, 'world_id': world_id,
+                 'current_locale': current_locale, 'playtime': playtime}
+                for name, world_id, current_locale, playtime in rows]
+
+    def count(self):
+        return self._connection().execute(
+            'SELECT count(*) FROM players').fetchone()[0]
+
+    def exists(self, name):
+        return self._connection().execute(
+            'SELECT 1 FROM players WHERE name = ?', (name,)).fetchone() \
+            is not None
+
+    def load(self, name, symbols=None):
+        row = self._connection().execute(
+            'SELECT save FROM players WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            raise LoadError("there is no save called ``{0}``".format(name))
+        return playerlib.from_bytes(row[0], symbols)
+
+    def save(self, player):
+        data = player.to_bytes()
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?, ?)',
+                (player.name, player.world_id, player.current_locale,
+                 player.meta['playtime'], time.time(), data))
+        player.changes = list()
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(
+                self.db_file, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+
+class _FileLock(COCClass):
+    """ An exclusive advisory lock on a file, held in a with block.
+    """
+    def __init__(self, lock_file):
+        super().__init__()
+        self.lock_file = lock_file
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.lock_file, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+
+
+def open_store(save_path, backend='files', journal=False, binary=True):
+    """ Returns the SaveStore for a save directory. With the ``sqlite``
+    backend, players are kept in ``saves.sqlite`` in that directory.
+    """
+    if backend == 'sqlite':
+        return SQLiteSaveStore(os.path.join(save_path, 'saves.sqlite'))
+    return FileSaveStore(save_path, journal=journal, binary=binary)
+
+
+def migrate(source, target, world=None):
+    """ Copies every player in the SaveStore ``source`` into ``target``.
+    Players of ``world`` are stored as changes to it; the others are copied
+    with the layout of their saves, which only works for saves that hold
+    their whole state. Returns the names of the players migrated, and
+    ``(name, reason)`` pairs for those that couldn't be, which are left
+    out.
+    """
+    migrated = list()
+    skipped = list()
+    after = None
+    while True:
+        headers = source.list(after=after, limit=100)
+        if not headers:
+            return migrated, skipped
+        for header in headers:
+            name = header['name']
+            try:
+                if world is not None and \
+                        header['world_id'] == world.get_id():
+                    player = source.load(name, world.symbols)
+                else:
+                    player = source.load(name)
+                    # YAML saves only tell their world once loaded
+                    if world is not None and \
+                            player.world_id == world.get_id():
+                        player.rebind(world)
+            except LoadError as e:
+                skipped.append((name, str(e)))
+                continue
+            target.save(player)
+            migrated.append(name)
+        after = headers[-1]['name']
@@ -0,0 +1,95 @@
+from coc import Immutable
+from coc.exceptions import StateNotFoundError
+
+# every path compiled so far, so that each distinct path is split only once
+# and shared by all of the events and conditions that use it
+_compiled = dict()
+
+
+class StatePath(Immutable):
+    """ A dotted state path such as ``world.npc.kiha.flags.met``, split once
+    into its tokens so that reads and writes of player state only walk the
+    nested state dicts. Get instances from compile_path() rather than
+    constructing them directly.
+    """
+    __slots__ = ('path', 'tokens', 'scope_tokens', 'key')
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.tokens = tuple(path.split('.'))
+        self.scope_tokens = self.tokens[:-1]
+        self.key = self.tokens[-1]
+        self.initialized = True
+
+    def get(self, state):
+        """ Returns the state element at this path in ``state``.
+        """
+        scope = state
+        try:
+            for token in self.tokens:
+                scope = scope[token]
+        except (KeyError, TypeError):
+            raise self._not_found(state)
+        if type(scope) == dict:
+            raise StateNotFoundError(
+                    msg="incomplete state path ``{0}`` - result is not a "
+                        "single state element".format(self.path))
+        return scope
+
+    def set(self, state, value):
+        """ Sets the state element at this path in ``state`` to ``value``.
+        The scope containing the element must already exist, and the element
+        may not be a scope itself.
+        """
+        scope = state
+        try:
+            for token in self.scope_tokens:
+                scope = scope[token]
+            if type(scope.get(self.key)) == dict:
+                raise StateNotFoundError(
+                        msg="incomplete state path ``{0}`` - result is not "
+                            "a single state element".format(self.path))
+        except (KeyError, TypeError, AttributeError):
+            raise self._not_found(state, self.scope_tokens)
+        scope[self.key] = value
+
+    def __reduce__(self):
+        # unpickled paths are shared through the compiled path cache too
+        return compile_path, (self.path,)
+
+    def __repr__(self):
+        return 'StatePath({0!r})'.format(self.path)
+
+    def __str__(self):
+        return self.path
+
+    def _not_found(self, state, tokens=None):
+        """ Walks the path again to report the first token that failed to
+        resolve. Only used on errors, so the fast paths stay a plain walk.
+        """
+        scope = state
+        resolved = list()
+        for token in self.tokens if tokens is None else tokens:
+            resolved.append(token)
+            try:
+                scope = scope[token]
+            except (KeyError, TypeError):
+                break
+        return StateNotFoundError(
+                msg="unable to resolve state path ``{0}``"
+                    .format('.'.join(resolved)),
+                found=resolved[0:-1],
+                requested=self.path,
+                error=resolved[-1])
+
+
+def compile_path(state_path):
+    """ Returns the StatePath for a dotted path string. Compiled paths are
+    cached, so calling this again with the same path is a dict lookup.
+    """
+    try:
+        return _compiled[state_path]
+    except KeyError:
+        path = _compiled[state_path] = StatePath(state_path)
+        return path
@@ -0,0 +1,458 @@
+from copy import deepcopy
+
+from coc import COCClass
+from coc.exceptions import StateNotFoundError
+from coc.world.symbols import KINDS, FLAGS, COUNTERS, NUMBERS, STRINGS, \
+    LOCAL_STRINGS, LOCAL
+
+
+class StateStore(COCClass):
+    """ Holds the state of one player as a copy-on-write overlay of the
+    shared defaults of a world's SymbolTable. Typed state (flags, counters,
+    numbers and strings) is kept in compact per-scope segments: a flag
+    bitset, int64 and double arrays, and string table indices, along with
+    the strings the table doesn't hold. Untyped state,
+    like the event lists of locales, is kept in nested dicts per scope.
+    A player only has private copies of the segments and scopes it changed,
+    i.e. of ``pc``, ``game`` or a ``world.<type>.<id>`` scope; everything
+    else is read from the symbol table.
+    State is read and written through StatePaths, so callers still see the
+    dotted-path state tree.
+    Snapshots share everything with the store they are taken from, and
+    either store copies a scope before its first change after that, so a
+    snapshot is O(1) and a change only copies the scope it is in.
+    Scopes can also be loaded lazily, e.g. from a binary save, in which case
+    they are only decoded when something in them is first accessed, and as
+    deltas that only hold what differs from the world's defaults.
+    """
+    __slots__ = ('symbols', 'slots', 'segments', 'scopes', 'pending',
+                 'owned', 'shared')
+
+    def __init__(self, symbols):
+        """ Returns a store with all state at its declared defaults.
+        """
+        self.symbols = symbols
+        self.slots = symbols.slots
+        # the typed segments and untyped scopes that this player changed
+        self.segments = dict()
+        self.scopes = dict()
+        # loaders of scopes that haven't been decoded yet
+        self.pending = dict()
+        # the segments and scopes that no snapshot shares, and whether the
+        # dicts above are shared with one
+        self.owned = set()
+        self.shared = False
+
+    def get(self, path):
+        """ Returns the state element at the StatePath ``path``.
+        """
+        slot = self.slots.get(path.path)
+        if slot is None:
+            return self._get_untyped(path)
+        segment, kind, offset = slot
+        if self.pending:
+            self._decode(self.symbols.scopes[segment])
+        values = self.segments.get(segment)
+        if values is None:
+            values = self.symbols.defaults[segment]
+        if kind == FLAGS:
+            return bool(values[FLAGS][offset >> 3] & (1 << (offset & 7)))
+        elif kind == COUNTERS or kind == NUMBERS:
+            return values[kind][offset]
+        return self._string(values, offset)
+
+    def set(self, path, value):
+        """ Sets the state element at the StatePath ``path`` to ``value``,
+        converted to the type of its slot if it has one.
+        """
+        slot = self.slots.get(path.path)
+        if slot is None:
+            return self._set_untyped(path, value)
+        if self.pending:
+            self._decode(self.symbols.scopes[slot[0]])
+        try:
+            self._set_slot(*slot, value)
+        except (TypeError, ValueError, OverflowError):
+            raise StateNotFoundError(
+                    msg="cannot store ``{0!r}`` in state element ``{1}`` of "
+                        "type {2}".format(value, path.path, KINDS[slot[1]]))
+
+    def defer(self, scope_tokens, loader, delta=False):
+        """ Replaces the scope at ``scope_tokens`` with the nested state dict
+        that ``loader`` returns, once the scope is first accessed. With
+        ``delta``, that dict is applied over the defaults of the scope, as
+        returned by scope_delta().
+        """
+        self._unshare()
+        self.pending[scope_tokens] = (loader, delta)
+
+    def snapshot(self):
+        """ Returns a copy of this store, which shares all of its state until
+        either of them changes it.
+        """
+        snapshot = StateStore(self.symbols)
+        snapshot.segments = self.segments
+        snapshot.scopes = self.scopes
+        snapshot.pending = self.pending
+        snapshot.shared = self.shared = True
+        self.owned = set()
+        return snapshot
+
+    def default(self, path):
+        """ Returns the world's default of the untyped state element at the
+        StatePath ``path``, or None if it has none.
+        """
+        return self._base_scope(path.tokens)
+
+    def changed_scopes(self):
+        """ Returns the scopes this player changed, as tuples of tokens.
+        """
+        changed = set(self.scopes)
+        changed.update(self.pending)
+        changed.update(self.symbols.scopes[segment]
+                       for segment in self.segments)
+        return changed
+
+    def all_scopes(self):
+        """ Returns every scope of this state, as tuples of tokens.
+        """
+        scopes = self.changed_scopes()
+        scopes.update(scope_tokens for scope_tokens, _ in
+                      _scopes(self.symbols.base))
+        scopes.update(self.symbols.scopes)
+        return scopes
+
+    def scope_dict(self, scope_tokens):
+        """ Returns the state of a single scope as a nested dict.
+        """
+        self._decode(scope_tokens)
+        scope = self.scopes.get(scope_tokens)
+        if scope is None:
+            scope = self._base_scope(scope_tokens)
+        scope = deepcopy(scope) if scope is not None else dict()
+        segment = self.symbols.segment(scope_tokens)
+        if segment is not None:
+            self._fill_typed(scope, segment)
+        return scope
+
+    def scope_delta(self, scope_tokens):
+        """ Returns the state of a single scope as a nested dict of only what
+        differs from the world's defaults, or None if the scope has to be
+        stored whole because it dropped some of the defaults.
+        """
+        self._decode(scope_tokens)
+        scope = self.scopes.get(scope_tokens)
+        base = self._base_scope(scope_tokens)
+        if scope is None:
+            delta = dict()
+        elif type(scope) == dict and base is None:
+            delta = deepcopy(scope)
+        elif type(scope) == dict and type(base) == dict:
+            delta = _diff(scope, base)
+        else:
+            delta = None
+        if delta is None:
+            return None
+        segment = self.symbols.segment(scope_tokens)
+        if segment is not None:
+            self._fill_typed(delta, segment, changed_only=True)
+        return delta
+
+    def to_dict(self):
+        """ Returns the whole state as a nested dict, e.g. for saving.
+        """
+        for scope_tokens in list(self.pending):
+            self._decode(scope_tokens)
+        symbols = self.symbols
+        state = deepcopy(symbols.base)
+        for scope_tokens, scope in self.scopes.items():
+            parent = state
+            for token in scope_tokens[:-1]:
+                parent = parent.setdefault(token, dict())
+            parent[scope_tokens[-1]] = deepcopy(scope)
+        for segment, scope_tokens in enumerate(symbols.scopes):
+            scope = state
+            for token in scope_tokens:
+                scope = scope.setdefault(token, dict())
+            self._fill_typed(scope, segment)
+        return state
+
+    @classmethod
+    def from_dict(cls, symbols, state):
+        """ Returns a store holding the nested state dict ``state``. Scopes
+        that ``state`` leaves out are at their defaults, and typed elements
+        that ``symbols`` doesn't declare are kept as they are.
+        """
+        store = cls(symbols)
+        for scope_tokens, scope in _scopes(state):
+            store._load_scope(scope_tokens, scope)
+        return store
+
+    def _fill_typed(self, scope, segment, changed_only=False):
+        """ Adds the typed state of a segment to the nested dict of its
+        scope, or only the elements that differ from their defaults with
+        ``changed_only``.
+        """
+        symbols = self.symbols
+        defaults = symbols.defaults[segment]
+        values = self.segments.get(segment)
+        if values is None:
+            if changed_only:
+                return
+            values = defaults
+        for kind, names in enumerate(symbols.names[segment]):
+            if not names or changed_only and values[kind] == defaults[kind]:
+                continue
+            typed = scope.setdefault(KINDS[kind], dict())
+            for offset, name in enumerate(names):
+                if changed_only and \
+                        values[kind][offset] == defaults[kind][offset]:
+                    continue
+                if kind == FLAGS:
+                    typed[name] = bool(
+                        values[FLAGS][offset >> 3] & (1 << (offset & 7)))
+                elif kind == COUNTERS or kind == NUMBERS:
+                    typed[name] = values[kind][offset]
+                else:
+                    typed[name] = self._string(values, offset)
+
+    def _decode(self, scope_tokens):
+        if scope_tokens not in self.pending:
+            return
+        self._unshare()
+        loader, delta = self.pending.pop(scope_tokens)
+        scope = loader()
+        if delta:
+            scope = _merge(self._base_scope(scope_tokens), scope)
+        self._load_scope(scope_tokens, scope)
+
+    def _load_scope(self, scope_tokens, scope):
+        if type(scope) != dict:
+            self._store_scope(scope_tokens, deepcopy(scope))
+            return
+        untyped = self._load(scope, scope_tokens)
+        if untyped != self._base_scope(scope_tokens):
+            self._store_scope(scope_tokens, untyped)
+
+    def _store_scope(self, scope_tokens, scope):
+        self._unshare()
+        self.scopes[scope_tokens] = scope
+        self.owned.add(scope_tokens)
+
+    def _unshare(self):
+        """ Copies the dicts of segments and scopes if a snapshot shares
+        them; the segments and scopes in them are copied as they change.
+        """
+        if self.shared:
+            self.segments = dict(self.segments)
+            self.scopes = dict(self.scopes)
+            self.pending = dict(self.pending)
+            self.shared = False
+
+    def _get_untyped(self, path):
+        tokens = path.tokens
+        scope_tokens = tokens[:_scope_depth(tokens)]
+        if self.pending:
+            self._decode(scope_tokens)
+        scope = self.scopes.get(scope_tokens)
+        if scope is None:
+            scope = self._base_scope(scope_tokens)
+        element = scope
+        try:
+            for token in tokens[len(scope_tokens):]:
+                element = element[token]
+            if type(element) != dict and scope is not None:
+                return element
+        except (KeyError, TypeError):
+            pass
+        # let the path report what failed to resolve
+        return path.get(_view(scope_tokens, scope))
+
+    def _set_untyped(self, path, value):
+        tokens = path.tokens
+        scope_tokens = tokens[:_scope_depth(tokens)]
+        if len(tokens) == len(scope_tokens):
+            raise StateNotFoundError(
+                    msg="incomplete state path ``{0}`` - result is not a "
+                        "single state element".format(path.path))
+        if self.pending:
+            self._decode(scope_tokens)
+        scope = self.scopes.get(scope_tokens)
+        if scope is None:
+            scope = deepcopy(self._base_scope(scope_tokens))
+        elif scope_tokens not in self.owned:
+            scope = deepcopy(scope)
+        view = _view(scope_tokens, scope)
+        try:
+            path.set(view, value)
+        except StateNotFoundError:
+            if len(tokens) < len(scope_tokens) + 2 or \
+                    tokens[-2] not in KINDS:
+                raise
+            # typed scopes are only kept for undeclared elements, so they
+            # are created on demand
+            parent = view
+            for token in tokens[:-2]:
+                parent = parent.get(token) if type(parent) == dict else None
+            if type(parent) != dict:
+                raise
+            parent.setdefault(tokens[-2], dict())[tokens[-1]] = value
+        self._store_scope(scope_tokens, scope)
+
+    def _base_scope(self, scope_tokens):
+        """ Returns the shared default of an untyped scope, or None if the
+        world doesn't define it.
+        """
+        scope = self.symbols.base
+        for token in scope_tokens:
+            try:
+                scope = scope[token]
+            except (KeyError, TypeError):
+                return None
+        return scope
+
+    def _load(self, scope, scope_tokens):
+        """ Moves the declared elements of ``scope`` into their slots, and
+        returns a copy of what is left.
+        """
+        untyped = dict()
+        for key, value in scope.items():
+            if type(value) != dict:
+                untyped[key] = deepcopy(value)
+            elif key in KINDS:
+                undeclared = dict()
+                for name, element in value.items():
+                    slot = self.slots.get(
+                        '.'.join(scope_tokens + (key, name)))
+                    if slot is not None:
+                        self._set_slot(*slot, element)
+                    else:
+                        undeclared[name] = deepcopy(element)
+                if undeclared:
+                    untyped[key] = undeclared
+            else:
+                untyped[key] = self._load(value, scope_tokens + (key,))
+        return untyped
+
+    def _set_slot(self, segment, kind, offset, value):
+        """ Sets a slot, copying its segment from the defaults first unless
+        the value is unchanged.
+        """
+        values = self.segments.get(segment)
+        if values is None:
+            values = self.symbols.defaults[segment]
+        if kind == FLAGS:
+            bit = 1 << (offset & 7)
+            if bool(values[FLAGS][offset >> 3] & bit) != bool(value):
+                self._own(segment)[FLAGS][offset >> 3] ^= bit
+            return
+        if value is None:
+            raise TypeError(value)
+        if kind == COUNTERS:
+            counter = int(value)
+            if counter != value and type(value) is not str:
+                raise ValueError(value)
+            value = counter
+        elif kind == NUMBERS:
+            value = float(value)
+        else:
+            value = str(value)
+            index = self.symbols.string_ids.get(value)
+            if index is None:
+                # strings outside the world's table are kept by the segment
+                if values[STRINGS][offset] != LOCAL or \
+                        values[LOCAL_STRINGS][offset] != value:
+                    values = self._own(segment)
+                    values[STRINGS][offset] = LOCAL
+                    values[LOCAL_STRINGS][offset] = value
+                return
+            if values[STRINGS][offset] == LOCAL:
+                self._own(segment)[LOCAL_STRINGS][offset] = None
+            value = index
+        if values[kind][offset] != value:
+            self._own(segment)[kind][offset] = value
+
+    def _string(self, values, offset):
+        index = values[STRINGS][offset]
+        if index == LOCAL:
+            return values[LOCAL_STRINGS][offset]
+        return self.symbols.string_values[index]
+
+    def _own(self, segment):
+        """ Returns the values of a segment for changing, copying them first
+        from the defaults or a snapshot that shares them.
+        """
+        values = self.segments.get(segment)
+        if segment not in self.owned:
+            if values is None:
+                values = self.symbols.defaults[segment]
+            self._unshare()
+            values = self.segments[segment] = tuple(
+                value[:] for value in values)
+            self.owned.add(segment)
+        return values
+
+
+def _scope_depth(tokens):
+    """ Returns the number of tokens naming the copy-on-write scope of a
+    path, i.e. ``world.<type>.<id>`` or a top level scope like ``pc``.
+    """
+    return 3 if tokens[0] == 'world' else 1
+
+
+def _scopes(state):
+    """ Yields the ``(scope_tokens, scope)`` of every copy-on-write scope in a
+    nested state dict.
+    """
+    for key, value in state.items():
+        if key == 'world' and type(value) == dict:
+            for type_, objects in value.items():
+                for id_, scope in objects.items():
+                    yield ('world', type_, id_), scope
+        else:
+            yield (key,), value
+
+
+def _diff(scope, base):
+    """ Returns the parts of the nested dict ``scope`` that differ from
+    ``base``, or None if ``scope`` lacks some keys of ``base``.
+    """
+    if any(key not in scope for key in base):
+        return None
+    delta = dict()
+    for key, value in scope.items():
+        default = base.get(key)
+        if key in base and value == default:
+            continue
+        if type(value) == dict and type(default) == dict:
+            value = _diff(value, default)
+            if value is None:
+                return None
+        else:
+            value = deepcopy(value)
+        delta[key] = value
+    return delta
+
+
+def _merge(base, delta):
+    """ Returns the nested dict ``base`` with a delta from _diff() applied.
+    ``base`` itself is left as it is.
+    """
+    if type(base) != dict:
+        return delta
+    scope = dict(base)
+    for key, value in delta.items():
+        if type(value) == dict and type(base.get(key)) == dict:
+            value = _merge(base[key], value)
+        scope[key] = value
+    return scope
+
+
+def _view(scope_tokens, scope):
+    """ Returns a nested state dict that holds only ``scope``, so that a
+    StatePath can resolve against it.
+    """
+    view = dict() if scope is None else {scope_tokens[-1]: scope}
+    for token in reversed(scope_tokens[:-1]):
+        view = {token: view}
+    return view
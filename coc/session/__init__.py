@@ -1,15 +1,19 @@
 import os
+import sqlite3
 import sys
 import yaml
+from collections import deque
 
 from coc import COCClass
 from coc import world
 from coc import player as playerlib
-from coc.exceptions import ExitMenuException, LoadError, \
-    IncorrectObjectTypeError
+from coc.player import saves as savelib
+from coc.exceptions import COCException, ExitMenuException, LoadError, \
+    InterfaceException, SchemaError
 from coc.session import game_load, initialization
-from coc.world.locale import get_locale_by_id
-from coc.world.eventstream import get_eventstream_by_id
+from coc.session.autosave import Autosaver
+from coc.world.program import Program
+from coc.world.watch import WorldWatcher
 
 
 class Session(COCClass):
@@ -17,125 +21,211 @@ class Session(COCClass):
     bind a Player and a World object to the interface so that they may be
     interacted with by a human.
     """
-    def __init__(self, world_path, interface):
+    def __init__(self, world_path, interface, world_cache=None,
+                 world_workers=None, lazy_world=False, watch_world=False,
+                 shared_world=None, journal_saves=False,
+                 save_format='binary', save_store='files',
+                 autosave_changes=50, autosave_interval=30.0,
+                 checkpoints=20):
+        """ Players are saved in a SaveStore, either a directory of save
+        files (``files``) or an SQLite database (``sqlite``). The player is
+        saved in the background after ``autosave_changes`` changes to its
+        state, or ``autosave_interval`` seconds after its first unsaved
+        change; set either to None to only save when asked to.
+        A checkpoint of the game is kept before each of the last
+        ``checkpoints`` event streams, which rollback() returns to.
+        """
         super().__init__()
-        self.world = world.load(world_path)
+        if shared_world is not None:
+            # Worlds are immutable at play time, so sessions hosted in one
+            # process can all play the same one
+            self.world = shared_world
+        else:
+            self.world = world.load(world_path, cache_path=world_cache,
+                                    workers=world_workers, lazy=lazy_world)
         self.interface = interface
+        self.journal_saves = journal_saves
+        self.binary_saves = save_format == 'binary'
+        self.save_store = save_store
+        self.saves = None
+        self.autosave_changes = autosave_changes
+        self.autosave_interval = autosave_interval
+        self.autosaver = None
+        self.checkpoints = deque(maxlen=checkpoints)
+        self.program = Program(self.world)
         self.player = None
-        self.save_file = None
+        self.watcher = None
+        if watch_world:
+            self.watcher = WorldWatcher(self.world).start()
 
     def choose_save(self, save_path):
+        self.saves = savelib.open_store(
+            os.path.expanduser(save_path), backend=self.save_store,
+            journal=self.journal_saves, binary=self.binary_saves)
         while not self.player:
             try:
-                self.save_file = game_load.select_save(
-                    os.path.expanduser(save_path))
-                self.load_player(self.save_file)
+                name, new_game = game_load.select_save(self.saves)
+                if new_game:
+                    self.player = self.new_player(name)
+                    self.saves.save(self.player)
+                    self.start_autosave()
+                else:
+                    self.load_player(name)
             except LoadError as e:
                 self.interface.print(str(e), buffer='flush')
             except ExitMenuException:
                 sys.exit(0)
         return self
 
-    def load_player(self, save_file):
+    def load_player(self, name):
         try:
-            player = playerlib.load(save_file)
-# FIXME: world ID generation is broken. the same world generates multiple IDs.
-#  check the world ID scheme generating code,
-#  deepcopy may not be a stable operation.
-            # if player.world_id != self.world.id:
-            #     self.interface.prompt('')
-            #     raise LoadError(
-            #             "Save file does not match the selected world!")
+            player = self.saves.load(name, self.world.symbols)
+            if player.world_id != self.world.get_id():
+                try:
+                    changed = self.world.get_changed_objects(
+                        player.meta['world_objects'])
+                except (TypeError, KeyError):
+                    raise LoadError(
+                        "Save file does not match the selected world!")
+                raise LoadError(
+                    "Save file does not match the selected world! Changed "
+                    "objects: {0}".format(', '.join(changed)))
             self.player = player
         except LoadError as e:
             raise LoadError(
                     "Encountered an error while loading ``{0}``: {1}".format(
-                        save_file,
+                        name,
                         str(e)
                         )
                     )
-        except FileNotFoundError:
-            player = self.new_player()
-            player.save(save_file)
-            with open(os.path.join(os.path.dirname(self.save_file),
-                                   'saves.yaml'), 'r') as file:
-                saves = yaml.safe_load(file.read())
-            assert player.name not in saves
-            saves[player.name] = self.save_file
-            with open(os.path.join(os.path.dirname(self.save_file),
-                                   'saves.yaml'), 'w') as file:
-                file.write(yaml.safe_dump(saves))
-            self.player = player
+        self.start_autosave()
         return self
 
+    def start_autosave(self):
+        if self.autosaver is not None:
+            self.autosaver.close()
+            self.autosaver = None
+        if self.autosave_changes is not None and \
+                self.autosave_interval is not None:
+            self.autosaver = Autosaver(
+                self.player, self.saves, max_changes=self.autosave_changes,
+                interval=self.autosave_interval).start()
+
     def save_player(self, save_file=None):
-        try:
-            self.player.save(save_file)
-        except AttributeError as e:
-            if str(e) == "'NoneType' object has no attribute 'endswith'":
-                # tried to check if a nonexistent path had
-                # the right file extension
-                self.player.save(self.save_file)
-            else:
-                raise
+        """ Saves the player to its SaveStore, or exports it to
+        ``save_file``.
+        """
+        if save_file is not None:
+            self.player.save(save_file, binary=self.binary_saves)
+        elif self.autosaver is not None:
+            # saves must go through the autosaver, so they are written in
+            # order
+            self.autosaver.save(wait=True)
+        else:
+            self.saves.save(self.player)
 
-    def new_player(self):
-        state_template = self.world.get_state_template()
+    def new_player(self, player_name):
+        # world objects start out in their template state, which the player
+        # shares with the world until it changes them
         initial_state = dict()
         initial_state['pc'] = initialization.initialize_pc_state(
-            state_template['pc'], self.interface)
+            self.world.pc_template, self.interface)
         initial_state['game'] = initialization.initialize_game_state(
-            state_template['game'], self.interface)
-        initial_state['world'] = state_template['world']
-        player_name = os.path.split(self.save_file)[-1]
-        if player_name.endswith('csf'):
-            player_name = os.path.splitext(player_name)[0]
-        new_player = playerlib.Player(player_name, self.world.get_id(),
-                                      initial_state, None)
+            dict(), self.interface)
+        new_player = playerlib.Player(
+            player_name, self.world.get_id(), initial_state,
+            {'world_objects': self.world.get_object_hashes()},
+            self.world.symbols)
         return new_player
 
+    def apply_world_changes(self):
+        """ Swaps in any world schema files the watcher has reloaded since
+        the last call. Schema errors in the edited files are reported, and the
+        world keeps its previous version of them. Returns whether any files
+        were reloaded.
+        """
+        if self.watcher is None:
+            return False
+        # reloading the world replaces its condition compiler
+        compiler = self.world.conditions
+        try:
+            self.watcher.apply()
+        except (SchemaError, LoadError, yaml.YAMLError) as e:
+            self.interface.error(str(e))
+        if self.player is not None:
+            self.player.rebind(self.world)
+        return self.world.conditions is not compiler
+
+    def recompile(self, streams):
+        """ Compiles the world's event streams afresh, and moves the addresses
+        in ``streams`` over to the new program.
+        """
+        program, self.program = self.program, Program(self.world)
+        streams[:] = [self.program.address(program.stream_at(address))
+                      for address in streams]
+
+    def rollback(self, steps=1):
+        """ Rolls the game back to the start of the event stream ``steps``
+        streams ago, without reloading the save. Returns whether there was a
+        checkpoint to go back to.
+        """
+        if not 0 < steps <= len(self.checkpoints):
+            return False
+        for _ in range(steps):
+            checkpoint = self.checkpoints.pop()
+        self.player.restore(checkpoint)
+        # the checkpoint may predate a reload of the world
+        self.player.rebind(self.world)
+        return True
+
+    def autosave(self):
+        """ Saves the player in the background if the autosave policy says
+        so, and reports earlier autosaves that failed.
+        """
+        if self.autosaver is None:
+            return
+        try:
+            self.autosaver.notify()
+        except (OSError, ValueError, TypeError, yaml.YAMLError,
+                sqlite3.Error) as e:
+            self.interface.error("Autosave failed: {0}".format(str(e)))
+
     def play(self):
         locales = [self.player.get_state('pc.strings.initial_locale')]
-        # TODO: Wire up event playthrough, starting from coc.world.events.run()
-        # It looks like conditionals aren't properly parsed and loaded from
-        # event sequences at event schema read time
-        # Also need a handler that is called when an event sequence terminates,
-        # which calls the visit event on the current locale
+        # the addresses of the compiled event streams left to run
+        streams = list()
+        # how many locales and streams were pushed when the running stream
+        # started
+        pushed = [0, 0]
+
+        def enter(address):
+            # streams run on into are rolled back on their own
+            self.checkpoints.append(self.player.checkpoint())
+            pushed[:] = len(locales), len(streams)
         while True:
             self.interface.clear(clear_title=True)
             current_locale = locales.pop()
-            eventstreams = list(
-                reversed(
-                    [get_eventstream_by_id(event) for
-                     event in
-                     self.player.visit(current_locale)]
-                )
-            )
-            while eventstreams:
-                current_eventstream = eventstreams.pop()
-                events = current_eventstream.run(self.player.get_state)
-                for event in events:
-                    push = event.do(
-                        self.player,
-                        self.world,
-                        self.interface
-                    )
-                    if push is None:
-                        continue
-                    elif not isinstance(push, list):
-                        push = [push]
-                    for item in push:
-                        if item['type'] == 'locale':
-                            locales.append(get_locale_by_id(item['id']))
-                        elif item['type'] == 'eventstream':
-                            eventstreams.append(
-                                get_eventstream_by_id(item['id'])
-                            )
-                        else:
-                            raise IncorrectObjectTypeError(
-                                "Sequence in event ``{0}`` returned an "
-                                "unsupported next object type ``{1}``"
-                                .format(current_eventstream.id_, item['type']))
+            streams.extend(self.program.address(stream) for stream in
+                           reversed(self.player.visit(current_locale)))
+            while streams:
+                if self.apply_world_changes():
+                    self.recompile(streams)
+                address = streams.pop()
+                try:
+                    self.program.run(address, self.player, self.interface,
+                                     streams, locales, enter)
+                except InterfaceException:
+                    raise
+                except COCException as e:
+                    # undo whatever the broken stream did to the game
+                    self.rollback()
+                    del locales[pushed[0]:]
+                    del streams[pushed[1]:]
+                    self.interface.error(
+                        "Event stream ``{0}`` failed and was rolled back: "
+                        "{1}".format(
+                            self.program.stream_at(self.program.current),
+                            str(e)))
+                self.autosave()
             if not locales:
-                # TODO: remove this print statement
                 locales.append(current_locale)
@@ -0,0 +1,145 @@
+import atexit
+import threading
+import time
+
+from coc import COCClass
+
+
+class Autosaver(COCClass):
+    """ Saves a Player on a background thread, so that the thread running the
+    game never waits on the disk. notify() should be called between events;
+    it takes a snapshot of any changes to the player and hands it to the
+    background thread, which writes it once ``max_changes`` state changes
+    have been made, or ``interval`` seconds after the first unsaved change,
+    even if the game is waiting on the player by then. Snapshots that are
+    still waiting when a newer one is taken are coalesced into it.
+    Snapshots are written to the SaveStore ``saves``, which never leaves a
+    torn save behind after a crash.
+    """
+    def __init__(self, player, saves, max_changes=50, interval=30.0):
+        super().__init__()
+        self.player = player
+        self.saves = saves
+        self.max_changes = max_changes
+        self.interval = interval
+        # the journal the saved snapshots continue, and the generation of
+        # the snapshot last written, as kept by the player
+        self.journal_file = player.journal_file
+        self.journal_length = player.journal_length
+        self.generation = player.meta.get('generation')
+        self.pending = None
+        # when the pending snapshot is due, or None if it is due now
+        self.deadline = None
+        self.saving = False
+        self.errors = list()
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        # finish the last save when the game exits
+        atexit.register(self.close)
+        return self
+
+    def notify(self):
+        """ Saves the player in the background if the autosave policy says
+        so. Raises the error of any earlier save that failed.
+        """
+        player = self.player
+        if player.changes:
+            with self._condition:
+                staged = 0 if self.pending is None else \
+                    len(self.pending.changes)
+            deadline = player.changed_at + self.interval
+            if staged + len(player.changes) >= self.max_changes or \
+                    time.monotonic() >= deadline:
+                self.save()
+            else:
+                self.save(deadline=deadline)
+        self.raise_errors()
+
+    def save(self, wait=False, deadline=None):
+        """ Saves the player in the background now, or at the monotonic time
+        ``deadline``. With ``wait``, waits for the save to be written.
+        """
+        snapshot = self.player.snapshot()
+        with self._condition:
+            if self.pending is not None:
+                # the journal must get the changes of every snapshot
+                snapshot.changes[0:0] = self.pending.changes
+                snapshot.rolled_back |= self.pending.rolled_back
+                # the earlier changes are still due when they were
+                if deadline is not None:
+                    deadline = None if self.deadline is None else \
+                        min(deadline, self.deadline)
+            self.pending = snapshot
+            self.deadline = deadline
+            self._condition.notify_all()
+            if wait:
+                self._condition.wait_for(
+                    lambda: self.pending is None and not self.saving)
+        if wait:
+            self.raise_errors()
+
+    def raise_errors(self):
+        with self._condition:
+            errors = self.errors
+            self.errors = list()
+        for error in errors:
+            raise error
+
+    def close(self):
+        """ Writes any waiting snapshot, and stops the background thread.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
+        atexit.unregister(self.close)
+
+    def _due(self):
+        if self._stopped:
+            return True
+        return self.pending is not None and (
+            self.deadline is None or time.monotonic() >= self.deadline)
+
+    def _remaining(self):
+        """ Returns the seconds until the pending snapshot is due, or None
+        if there is none to wait for.
+        """
+        if self.pending is None or self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # a newer snapshot may be due sooner, so the time left is
+                # worked out again whenever the thread is woken
+                while not self._due():
+                    self._condition.wait(self._remaining())
+                snapshot = self.pending
+                if snapshot is None:
+                    return
+                self.pending = None
+                self.deadline = None
+                self.saving = True
+            snapshot.journal_file = self.journal_file
+            snapshot.journal_length = self.journal_length
+            snapshot.meta['generation'] = self.generation
+            try:
+                self.saves.save(snapshot)
+                self.journal_file = snapshot.journal_file
+                self.journal_length = snapshot.journal_length
+                self.generation = snapshot.meta['generation']
+            except Exception as e:
+                # the journal may have missed these changes, so the next
+                # save writes a full snapshot
+                self.journal_file = None
+                with self._condition:
+                    self.errors.append(e)
+            with self._condition:
+                self.saving = False
+                self._condition.notify_all()
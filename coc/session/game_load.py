@@ -1,41 +1,56 @@
-import os
-import yaml
+from tui import interface as i
 
-from coc.exceptions import LoadError
+# the number of saves listed on each page of the save menu
+PAGE_SIZE = 20
 
-from tui import interface as i
+NEW_GAME = '< new game >'
+NEXT_PAGE = '< next page >'
+PREVIOUS_PAGE = '< previous page >'
 
 
-def select_save(save_path):
-    # Read existing save files to populate the menu
-    try:
-        with open(os.path.join(save_path, 'saves.yaml'), 'r') as file:
-            saves = yaml.safe_load(file.read())
-    except (yaml.YAMLError, KeyError) as e:
-        raise LoadError("Unable to load your saves.\n"
-                        "saves.yaml is corrupted!") from e
-    except FileNotFoundError:
-        # No save.yaml yet on the target path.
-        # Assume this is an uninitialized save path.
-        saves = {}
-        if not os.path.isdir(save_path):
-            os.mkdir(save_path)
-        with open(os.path.join(save_path, 'saves.yaml'), 'w+') as file:
-            file.write(yaml.safe_dump(saves))
-    menu = list(saves.keys())
-    menu.insert(0, '< new game >')
+def select_save(saves):
+    """ Asks the player to pick a save from the SaveStore ``saves``, or to
+    start a new game. Returns the name of the save, and whether it is a new
+    game. Saves are listed a page at a time, so the menu stays fast however
+    many there are.
+    """
+    # the name each page starts after, for going back
+    pages = [None]
     while True:
+        headers = saves.list(after=pages[-1], limit=PAGE_SIZE + 1)
+        labels = {describe_save(header): header['name']
+                  for header in headers[:PAGE_SIZE]}
+        menu = [NEW_GAME] + list(labels)
+        if len(pages) > 1:
+            menu.append(PREVIOUS_PAGE)
+        if len(headers) > PAGE_SIZE:
+            menu.append(NEXT_PAGE)
         save_name = i.menu_choice(menu, title="Select a save!")
-        if save_name == '< new game >':
+        if save_name == NEXT_PAGE:
+            pages.append(headers[PAGE_SIZE - 1]['name'])
+        elif save_name == PREVIOUS_PAGE:
+            pages.pop()
+        elif save_name == NEW_GAME:
             name = i.get_line(
                 prompt="Beginning a new game! What will we call you?")
             if not name:
                 i.error("Empty names are not allowed!")
-            elif name in saves:
+            elif saves.exists(name):
                 i.error("A game with that name already exists!")
             else:
                 i.clear()
                 i.prompt("Welcome, {0}!".format(name))
-                return save_path.rstrip('/') + '/' + name + '.csf'
+                return name, True
         else:
-            return saves[save_name]
+            return labels[save_name], False
+
+
+def describe_save(header):
+    """ Returns a menu label for a save, from its header alone.
+    """
+    if header.get('playtime') is None:
+        return header['name']
+    minutes = int(header['playtime']) // 60
+    return '{0} ({1}, {2}h {3:02}m)'.format(
+        header['name'], header.get('current_locale') or 'new game',
+        minutes // 60, minutes % 60)
@@ -1,12 +1,44 @@
 import yaml
 import os
 import glob
-import hashlib
+from concurrent import futures
 from copy import deepcopy
 
 from coc import Immutable
-from coc.world import npc, monster, eventstream, town, dungeon, locale
-from coc.exceptions import SchemaError
+from coc.world import npc, monster, eventstream, town, dungeon, bundle, \
+    store
+from coc.world import conditional, footprint
+from coc.world.symbols import SymbolTable
+from coc.world.textarena import ArenaBuilder
+from coc.world.digest import WorldDigest
+from coc.world.graph import WorldGraph
+from coc.exceptions import LoadError, NotPermittedError, \
+    ObjectNotFoundError, SchemaError
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+schema_types = [
+    'event_stream',
+    'town',
+    'dungeon',
+    'npc',
+    'monster',
+    'world',
+    'pc'
+]
+
+# the registry each object type is kept in, which is also the section of the
+# world state template that holds its state
+_registries = {
+    'event_stream': 'event_stream',
+    'town': 'locale',
+    'dungeon': 'locale',
+    'npc': 'npc',
+    'monster': 'monster',
+}
 
 
 class World(Immutable):
@@ -14,31 +46,42 @@ class World(Immutable):
     assets, and a template state object which a Player copies when a new
     game is started.
     Worlds are read-only after being initialized, and their contents are fully
-    defined by a YAML world schema.
+    defined by a YAML world schema. Each World owns the registries of its
+    objects, so any number of Worlds can be loaded side by side, and any
+    number of Sessions can share one.
     """
-    def __init__(self, schema_root):
+    def __init__(self, schema_root, workers=None):
         super().__init__()
-        file_paths = glob.glob(os.path.join(schema_root, '*.yaml'))
-        loaded_paths = list()
-        subdirs = [d.name for d in os.scandir(schema_root) if d.is_dir()]
-        for subdir in subdirs:
-            file_paths.extend(glob.glob(
-                    os.path.join(schema_root, subdir, '*.yaml')))
-        schema_types = [
-            'event_stream',
-            'town',
-            'dungeon',
-            'npc',
-            'monster',
-            'world',
-            'pc'
+        self.registries = {
+            'event_stream': dict(),
+            'locale': dict(),
+            'npc': dict(),
+            'monster': dict(),
+        }
+        self.source_globs = [
+            os.path.join(schema_root, '*.yaml'),
+            os.path.join(schema_root, '*', '*.yaml'),
         ]
+        file_paths = list()
+        for pattern in self.source_globs:
+            file_paths.extend(glob.glob(pattern))
+        loaded_paths = list()
+        self.source_paths = list()
+        self.digest = WorldDigest()
         schema_sets = {key: [] for key in schema_types}
+        if workers:
+            parsed = _parse_files_parallel(file_paths, workers)
+        else:
+            parsed = dict()
         while file_paths:
             path = file_paths.pop()
             loaded_paths.append(path)
-            with open(path, 'r') as file:
-                loaded = list(yaml.safe_load_all(file.read()))
+            self.source_paths.append(path)
+            try:
+                loaded = parsed[path]
+            except KeyError:
+                loaded = _parse_file(path)
+            self.digest.update_file(path, loaded)
             for schema in loaded:
                 try:
                     for path_ in schema['load_paths']:
@@ -47,6 +90,7 @@ class World(Immutable):
                         if additional_path not in loaded_paths:
                             file_paths.extend(glob.glob(additional_path))
                             loaded_paths.append(additional_path)
+                            self.source_globs.append(additional_path)
                 except KeyError:
                     pass
             try:
@@ -61,9 +105,17 @@ class World(Immutable):
         for schema_type in schema_types:
             for schema in schema_sets[schema_type]:
                 self._load_schema(schema_type, schema)
-        self.world_template = None
-        self.id_ = hashlib.sha256(repr(self.get_state_template()).encode()
-                                  ).hexdigest()
+        self.world_template = self._build_world_template()
+        self.symbols = self._build_symbols()
+        self.conditions = conditional.Compiler(self.symbols)
+        # report conditions on undeclared state while loading the schema
+        for stream in self.registries['event_stream'].values():
+            stream.compile(self.conditions)
+        self.graph = self._build_graph()
+        self.id_ = self.digest.get_root()
+        # these may only change through reload()
+        self.mutable = ['id_', 'world_template', 'pc_template', 'graph',
+                        'symbols', 'conditions']
         self.initialized = True
 
     def __setitem__(self, key, value):
@@ -73,21 +125,9 @@ class World(Immutable):
         return self.__getattribute__(key)
 
     def get_state_template(self):
-        if self.world_template:
-            world = deepcopy(self.world_template)
-        else:
-            world = {
-                    'npc': {obj.get_id(): obj.get_state_template()
-                            for obj in npc.get_all()},
-                    'monster': {obj.get_id(): obj.get_state_template()
-                                for obj in monster.get_all()},
-                    'locale': {obj.get_id(): obj.get_state_template()
-                               for obj in locale.get_all_locales()},
-                    }
-            self.world_template = deepcopy(world)
         ret = {
                 'pc': deepcopy(self.pc_template),
-                'world': world,
+                'world': deepcopy(self.world_template),
                 'game': dict()
                 }
         return ret
@@ -95,6 +135,201 @@ class World(Immutable):
     def get_id(self):
         return self.id_
 
+    def get_object_hashes(self):
+        """ Returns the content hash of every object in the world schema, so
+        that a save can record which version of each object it was made with.
+        """
+        return self.digest.get_object_hashes()
+
+    def get_changed_objects(self, object_hashes):
+        """ Returns the keys (e.g. ``npc:npc_kiha``) of all objects that
+        differ from those recorded in ``object_hashes``.
+        """
+        return self.digest.diff(object_hashes)
+
+    def reload(self, changes):
+        """ Replaces the objects loaded from some schema files with freshly
+        parsed versions. ``changes`` maps each changed file path to its parsed
+        documents, or to None if the file was removed. Only objects from those
+        files are rebuilt. If any of them fails to load, the registries are
+        rolled back and the error is raised.
+        """
+        for registry in self.registries.values():
+            if not isinstance(registry, dict):
+                raise NotPermittedError("unable to reload a lazily loaded "
+                                        "world")
+        hashed = deepcopy(changes)
+        removed = list()
+        added = list()
+        try:
+            for path in changes:
+                for key in self.digest.file_objects.get(path, {}):
+                    schema_type, _, id_ = key.partition(':')
+                    if schema_type in _registries:
+                        registry = self.registries[_registries[schema_type]]
+                        if id_ in registry:
+                            removed.append(
+                                (schema_type, id_, registry.pop(id_)))
+            for schema_type in schema_types:
+                for path in sorted(changes):
+                    for schema in changes[path] or []:
+                        if not isinstance(schema, dict) or \
+                                schema.get('type') != schema_type:
+                            continue
+                        self._load_schema(schema_type, schema)
+                        if schema_type in _registries:
+                            added.append((schema_type, schema['id']))
+        except Exception:
+            for schema_type, id_ in added:
+                self.registries[_registries[schema_type]].pop(id_, None)
+            for schema_type, id_, obj in removed:
+                self.registries[_registries[schema_type]][id_] = obj
+            raise
+        for schema_type, id_, _ in removed:
+            if schema_type != 'event_stream':
+                self.world_template[_registries[schema_type]].pop(id_, None)
+        for schema_type, id_ in added:
+            if schema_type != 'event_stream':
+                kind = _registries[schema_type]
+                self.world_template[kind][id_] = \
+                    self.registries[kind][id_].get_state_template()
+        for path, loaded in hashed.items():
+            if loaded is None:
+                self.digest.remove_file(path)
+                if path in self.source_paths:
+                    self.source_paths.remove(path)
+                continue
+            self.digest.update_file(path, loaded)
+            if path not in self.source_paths:
+                self.source_paths.append(path)
+            for schema in loaded:
+                try:
+                    for path_ in schema['load_paths']:
+                        additional_path = os.path.join(
+                            os.path.dirname(path), path_)
+                        if additional_path not in self.source_globs:
+                            self.source_globs.append(additional_path)
+                except (KeyError, TypeError):
+                    pass
+        self.symbols = self._build_symbols()
+        self.conditions = conditional.Compiler(self.symbols)
+        # conditions are checked against the new declarations on first use
+        for stream in self.registries['event_stream'].values():
+            stream.tests = None
+        self.graph = self._build_graph()
+        self.id_ = self.digest.get_root()
+
+    def pack_text(self, arena_dir, prefix):
+        """ Moves the prose of every event into a shared, memory-mapped text
+        arena in ``arena_dir``, whose file name starts with ``prefix``.
+        Returns the path of the arena file.
+        """
+        builder = ArenaBuilder(arena_dir, prefix)
+        for stream in self.registries['event_stream'].values():
+            for event in stream.events:
+                event.pack_text(builder)
+        return builder.write()
+
+    def get_memory_report(self):
+        """ Returns the number and total size in bytes of the objects of
+        each type held by this world, keyed by type name.
+        """
+        return footprint.report(self)
+
+    def get_dangling_references(self):
+        """ Returns ``(source, target)`` pairs of ``(type, id)`` keys for
+        every reference to an object the world does not define.
+        """
+        return self.graph.dangling()
+
+    def get_unreachable_objects(self):
+        """ Returns the ``(type, id)`` keys of all objects that can never be
+        reached from the world's initial locale.
+        """
+        return self.graph.unreachable('locale', self.initial_locale)
+
+    def get_unresolved_parameters(self):
+        """ Returns ``(stream id, message)`` pairs for every text parameter
+        that can't be resolved against the world's state, and so reads as
+        its slot.
+        """
+        unresolved = list()
+        for id_ in sorted(self.registries['event_stream'].keys()):
+            stream = self.get_eventstream_by_id(id_)
+            for key in sorted(stream.parameters.problems):
+                unresolved.append((id_, stream.parameters.problems[key]))
+        return unresolved
+
+    def get_eventstream_by_id(self, id_):
+        try:
+            stream = self.registries['event_stream'][id_]
+        except KeyError as e:
+            raise ObjectNotFoundError("event ``" + id_ +
+                                      "`` was not found in the event registry"
+                                      ) from e
+        if stream.tests is None:
+            # streams read from a bundle or store, or reloaded, are compiled
+            # when first run
+            stream.compile(self.conditions)
+        return stream
+
+    def is_eventstream_loaded(self, id_):
+        return id_ in self.registries['event_stream']
+
+    def get_locale_by_id(self, id_):
+        try:
+            return self.registries['locale'][id_]
+        except KeyError as e:
+            raise ObjectNotFoundError("locale ``" + id_ +
+                                      "`` was not found in the locale "
+                                      "registry") from e
+
+    def get_npc_by_id(self, id_):
+        try:
+            return self.registries['npc'][id_]
+        except KeyError as e:
+            raise ObjectNotFoundError("npc ``" + id_ +
+                                      "`` was not found in the npc registry")\
+                from e
+
+    def get_monster_by_id(self, id_):
+        try:
+            return self.registries['monster'][id_]
+        except KeyError as e:
+            raise ObjectNotFoundError("monster ``" + id_ +
+                                      "`` was not found in the monster "
+                                      "registry") from e
+
+    def _build_graph(self):
+        objects = dict()
+        for kind, registry in self.registries.items():
+            for obj in registry.values():
+                objects[(kind, obj.get_id())] = obj.get_references()
+        return WorldGraph(objects)
+
+    def _build_world_template(self):
+        return {
+                kind: {obj.get_id(): obj.get_state_template()
+                       for obj in self.registries[kind].values()}
+                for kind in ['npc', 'monster', 'locale']
+                }
+
+    def _build_symbols(self):
+        """ Returns a SymbolTable of all typed state the world declares, i.e.
+        that of every world object and everything the pc template sets up.
+        """
+        pc = dict()
+        for section in ['defaults', 'statics', 'choices']:
+            for kind, elements in self.pc_template.get(section, {}).items():
+                scope = pc.setdefault(kind, dict())
+                for name in elements:
+                    if section == 'statics':
+                        scope[name] = elements[name]
+                    else:
+                        scope.setdefault(name, None)
+        return SymbolTable({'pc': pc, 'world': self.world_template,
+                            'game': dict()})
+
     def _load_schema(self, path, schema):
         schema_handlers = {
                 'town': town.Town,
@@ -106,7 +341,7 @@ class World(Immutable):
                 'pc': self._load_pc_schema
                 }
         try:
-            schema_handlers[schema['type']](schema)
+            loaded = schema_handlers[schema['type']](schema)
         except KeyError as e:
             if e.args[0] == 'type':
                 raise SchemaError(
@@ -118,6 +353,26 @@ class World(Immutable):
                         'unable to load schema from {0}. ``{1}`` is not a '
                         'supported object type.'.format(path, schema['type']),
                         schema=schema) from e
+        if schema['type'] in _registries:
+            self._register(schema['type'], loaded)
+
+    def _register(self, schema_type, obj):
+        registry = self.registries[_registries[schema_type]]
+        if obj.get_id() in registry:
+            raise LoadError("attempted to load {0} ``{1}`` but that {2} id "
+                            "already exists".format(schema_type, obj.get_id(),
+                                                    _registries[schema_type]))
+        if schema_type in ['town', 'dungeon', 'npc']:
+            # event streams are always loaded first, so any of these
+            # contexts' events that are not loaded yet don't exist
+            for event_id in obj.state['events']:
+                if not self.is_eventstream_loaded(event_id):
+                    raise ObjectNotFoundError(
+                        "tried to load {0} object (id ``{1}``) with a "
+                        "nonexistant event_id in its event registry - "
+                        "requested id was ``{2}``"
+                        .format(schema_type, obj.get_id(), event_id))
+        registry[obj.get_id()] = obj
 
     def _load_pc_schema(self, schema):
         try:
@@ -129,28 +384,87 @@ class World(Immutable):
 
     def _load_world_schema(self, schema):
         for item in schema:
+            if self.initialized and item not in self.mutable:
+                self.mutable.append(item)
             self.__setattr__(item, schema[item])
 
-    @staticmethod
-    def _get_locale_by_id(id_):
-        return locale.get_locale_by_id(id_)
+    def get_locale_events(self, id_, player):
+        return self.get_locale_by_id(id_).run(player)
 
-    @staticmethod
-    def _get_npc_by_id(id_):
-        return npc.get_by_id(id_)
 
-    @staticmethod
-    def _get_monster_by_id(id_):
-        return monster.get_by_id(id_)
+def _parse_file(path):
+    with open(path, 'r') as file:
+        return list(yaml.load_all(file.read(), Loader=SafeLoader))
 
-    @staticmethod
-    def _get_event_by_id(id_):
-        return eventstream.get_eventstream_by_id(id_)
 
-    @classmethod
-    def get_locale_events(cls, id_, player):
-        return locale.get_locale_by_id(id_).run(player)
+def _parse_files_parallel(file_paths, workers):
+    """ Parses ``file_paths`` and any files they include through
+    ``load_paths`` on a pool of ``workers`` processes, and returns the parsed
+    documents keyed by path.
+    Files that fail to parse are left out of the result, so that World
+    re-parses them in load order and raises the same error a serial load
+    would.
+    """
+    parsed = dict()
+    with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_parse_file, path): path
+                   for path in set(file_paths)}
+        submitted = set(pending.values())
+        while pending:
+            done, _ = futures.wait(pending,
+                                   return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                if future.exception() is not None:
+                    continue
+                parsed[path] = future.result()
+                for schema in parsed[path]:
+                    try:
+                        includes = schema['load_paths']
+                    except (KeyError, TypeError):
+                        continue
+                    for path_ in includes:
+                        for additional_path in glob.glob(os.path.join(
+                                os.path.dirname(path), path_)):
+                            if additional_path not in submitted:
+                                submitted.add(additional_path)
+                                pending[pool.submit(
+                                    _parse_file, additional_path
+                                )] = additional_path
+    return parsed
 
 
-def load(schema_path):
-    return World(schema_path)
+def load(schema_path, cache_path=None, workers=None, lazy=False):
+    """ Loads the world schema at ``schema_path``. If ``cache_path`` is given,
+    a compiled bundle of the world is read from that directory when it is
+    still current, and (re)written there otherwise. If ``workers`` is given,
+    schema files are parsed on a pool of that many processes.
+    If ``lazy`` is set, the world is indexed into an SQLite store in
+    ``cache_path`` instead of a bundle, and its objects are only loaded from
+    there when they are looked up.
+    Either way, the prose of cached worlds is kept in a memory-mapped text
+    arena next to the bundle or store, shared by every process loading it.
+    """
+    if cache_path is None:
+        if lazy:
+            raise LoadError("a lazily loaded world requires a cache path to "
+                            "keep its store in")
+        return World(schema_path, workers=workers)
+    cache_path = os.path.expanduser(cache_path)
+    if lazy:
+        store_file = store.store_path(cache_path, schema_path)
+        world = store.read(store_file)
+        if world is None:
+            world = World(schema_path, workers=workers)
+            arena_file = world.pack_text(cache_path,
+                                         os.path.basename(store_file))
+            store.write(store_file, world, arena_file)
+            world = store.read(store_file)
+        return world
+    bundle_file = bundle.bundle_path(cache_path, schema_path)
+    world = bundle.read(bundle_file)
+    if world is None:
+        world = World(schema_path, workers=workers)
+        world.pack_text(cache_path, os.path.basename(bundle_file))
+        bundle.write(bundle_file, world)
+    return world
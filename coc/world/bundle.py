@@ -0,0 +1,85 @@
+import glob
+import hashlib
+import os
+import pickle
+
+BUNDLE_VERSION = 11
+
+
+def source_digest(paths):
+    """ Returns a sha256 hex digest over the paths and contents of every
+    schema source file in ``paths``.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.encode())
+        with open(path, 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+def bundle_path(cache_dir, schema_root):
+    """ Returns the bundle file used to cache the world at ``schema_root``.
+    """
+    key = hashlib.sha256(os.path.abspath(schema_root).encode()).hexdigest()
+    return os.path.join(cache_dir, key[:16] + os.extsep + 'bundle')
+
+
+def source_header(world):
+    """ Returns a record of the schema sources ``world`` was built from, for
+    checking later with is_current().
+    """
+    return {
+        'version': BUNDLE_VERSION,
+        'digest': source_digest(world.source_paths),
+        'source_globs': world.source_globs,
+        'source_paths': world.source_paths,
+    }
+
+
+def write(bundle_file, world):
+    """ Pickles ``world``, including its object registries, into
+    ``bundle_file``. The file is replaced atomically, so a concurrent reader
+    never sees a partial bundle.
+    """
+    header = source_header(world)
+    os.makedirs(os.path.dirname(bundle_file) or '.', exist_ok=True)
+    tmp_file = bundle_file + os.extsep + 'tmp'
+    with open(tmp_file, 'wb') as file:
+        pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(world, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, bundle_file)
+
+
+def read(bundle_file):
+    """ Loads the world stored in ``bundle_file``. Returns None if the bundle
+    is missing, unreadable, or stale with respect to the schema files it was
+    built from.
+    """
+    try:
+        with open(bundle_file, 'rb') as file:
+            header = pickle.load(file)
+            if not is_current(header):
+                return None
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, KeyError, TypeError):
+        return None
+
+
+def is_current(header):
+    """ Checks that a bundle header was written by this version of the bundle
+    format, that the schema files it was built from are unchanged, and that no
+    files have been added to any of the globs it loaded.
+    """
+    if header['version'] != BUNDLE_VERSION:
+        return False
+    found = set()
+    for pattern in header['source_globs']:
+        found.update(glob.glob(pattern))
+    if found != set(header['source_paths']):
+        return False
+    try:
+        return source_digest(header['source_paths']) == header['digest']
+    except OSError:
+        return False
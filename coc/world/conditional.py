@@ -1,5 +1,67 @@
-from coc import Immutable
+import heapq
+import itertools
+import operator
+
+from coc import COCClass, Immutable
 from coc.exceptions import ParseError, StateNotFoundError, SchemaError
+from coc.player.statepath import compile_path
+from coc.world.symbols import KINDS
+
+# the scopes of state whose elements a world declares up front; game state
+# is made by the interface when a game begins
+DECLARED_SCOPES = ('pc', 'world')
+STATE_SCOPES = DECLARED_SCOPES + ('game',)
+
+# what state that isn't set reads as, by its kind
+MISSING = dict(zip(KINDS, (False, 0, 0, None)))
+
+# compiled conditions are numbered across compilers, so that those of a
+# reloaded world never share a number with those compiled before
+_ids = itertools.count()
+
+
+class Compiler(COCClass):
+    """ Compiles conditions against the SymbolTable of a world. Conditions
+    are hash-consed: structurally identical ones, here or in any of their
+    subtrees, are compiled once and share a CompiledCondition, so a player's
+    ConditionMemo only tests them once.
+    """
+    def __init__(self, symbols):
+        super().__init__()
+        self.symbols = symbols
+        self.compiled = dict()
+
+    def compile(self, condition):
+        """ Returns the CompiledCondition of a condition tree.
+        """
+        key = condition.key()
+        compiled = self.compiled.get(key)
+        if compiled is None:
+            compiled = self.compiled[key] = CompiledCondition(
+                condition.compile(self), condition.paths())
+        return compiled
+
+    def __getstate__(self):
+        # compiled conditions are closures, so they are compiled again after
+        # loading
+        return {'symbols': self.symbols}
+
+    def __setstate__(self, state):
+        self.symbols = state['symbols']
+        self.compiled = dict()
+
+
+class CompiledCondition(COCClass):
+    """ A condition compiled into a closure, ``test``, which takes a state
+    function and returns whether the condition holds. ``paths`` are the
+    dotted state paths it reads.
+    """
+    __slots__ = ('id_', 'test', 'paths')
+
+    def __init__(self, test, paths):
+        self.id_ = next(_ids)
+        self.test = test
+        self.paths = paths
 
 
 class Expr(Immutable):
@@ -10,47 +72,153 @@ class Expr(Immutable):
         try:
             self.filters = [Filter(f) for f in expr.split('|')[1:]]
         except AttributeError:
-            raise ParseError("conditional expression expected but "
+            raise ParseError(expr, "conditional expression expected but "
                              "received ``{0}`` instead".format(type(expr)))
+        self.expr = expr
         self.tokens = expr.split('|')[0].split(' ')
-        self.arity = len(self.tokens - 1)
+        self.arity = len(self.tokens) - 1
         try:
             if self.arity == 0:
-                self.test = lambda x, _: bool(x)
-                self.args = [self.tokens[0]]
+                self.form = 'truth'
+                self.operator = bool
+                args = [self.tokens[0]]
             elif self.arity == 1:
                 try:
-                    self.test = unary[self.tokens[0]]
-                    self.args = [self.tokens[1]]
+                    self.operator = unary[self.tokens[0]]
+                    self.form = 'unary'
+                    args = [self.tokens[1]]
                 except KeyError:
-                    pass
+                    self.operator = funcs[self.tokens[0]]
+                    self.form = 'func'
+                    args = self.tokens[1:]
             elif self.arity == 2:
                 try:
-                    self.test = binary[self.tokens[1]]
-                    self.args = [self.tokens[0], self.tokens[2]]
+                    self.operator = binary[self.tokens[1]]
+                    self.form = 'binary'
+                    args = [self.tokens[0], self.tokens[2]]
                 except KeyError:
-                    self.test = funcs[self.tokens[0]]
-                    self.args = self.tokens[1:]
+                    self.operator = funcs[self.tokens[0]]
+                    self.form = 'func'
+                    args = self.tokens[1:]
             else:
-                self.test = funcs[self.tokens[0]]
-                self.args = self.tokens[1:]
+                self.operator = funcs[self.tokens[0]]
+                self.form = 'func'
+                args = self.tokens[1:]
         except KeyError:
-            raise ParseError("no recognized operator or function in "
-                             "conditional expression ``{0}``".format(expr),
-                             expr=expr)
+            raise ParseError(expr, "no recognized operator or function in "
+                             "conditional expression ``{0}``".format(expr))
+        # arguments are told apart up front: tokens naming state are
+        # compiled as state paths, along with what they read as while unset,
+        # and everything else is a typed literal
+        self.args = tuple((compile_path(arg), missing(arg)) if is_path(arg)
+                          else (None, literal(arg)) for arg in args)
         self.initialized = True
 
     def test(self, state_func):
         args = list()
-        for arg in self.args:
-            if type(arg) == str:
-                try:
-                    args.append(state_func(arg))
-                except StateNotFoundError:
-                    args.append(arg)
+        for path, value in self.args:
+            if path is None:
+                args.append(value)
+                continue
+            try:
+                args.append(state_func(path))
+            except StateNotFoundError:
+                args.append(value)
+        try:
+            if self.form == 'binary':
+                return self.operator(args[0], args[1])
+            elif self.form == 'func':
+                return self.operator(args)
+            return self.operator(args[0])
+        except TypeError as e:
+            raise self._failed(e)
+
+    def _failed(self, e):
+        """ Returns the ParseError for operands the operator can't take.
+        Being a SchemaError, it fails the world's load when raised while
+        compiling, and rolls back the stream when raised in play.
+        """
+        return ParseError(self.expr, "unable to evaluate conditional "
+                          "expression ``{0}``: {1}".format(self.expr, str(e)))
+
+    def key(self):
+        return 'expr', tuple(self.tokens)
+
+    def paths(self):
+        return frozenset(path.path for path, _ in self.args
+                         if path is not None)
+
+    def compile(self, compiler):
+        """ Returns a closure that tests this expression against a state
+        function, like test(). State paths must be declared by the SymbolTable
+        of the Compiler ``compiler``, and are resolved here once.
+        """
+        for path, _ in self.args:
+            if path is not None and path.tokens[0] in DECLARED_SCOPES and \
+                    not compiler.symbols.declares(path.path):
+                raise SchemaError(
+                    "conditional expression ``{0}`` refers to undeclared "
+                    "state ``{1}``".format(self.expr, path.path),
+                    schema={'<expr>': self.expr})
+        op = self.operator
+        if any(path is not None and path.tokens[0] not in DECLARED_SCOPES
+               for path, _ in self.args):
+            # undeclared state may not exist yet, so it is tested as usual
+            return self.test
+        getters = [(path is not None, value if path is None else path)
+                   for path, value in self.args]
+        failed = self._failed
+        if self.form == 'binary':
+            (a_is_path, a), (b_is_path, b) = getters
+            if a_is_path and b_is_path:
+                def test(get):
+                    try:
+                        return op(get(a), get(b))
+                    except TypeError as e:
+                        raise failed(e)
+                return test
+            elif a_is_path:
+                def test(get):
+                    try:
+                        return op(get(a), b)
+                    except TypeError as e:
+                        raise failed(e)
+                return test
+            elif b_is_path:
+                def test(get):
+                    try:
+                        return op(a, get(b))
+                    except TypeError as e:
+                        raise failed(e)
+                return test
+            args = a, b
+        elif self.form == 'func':
+            if not any(is_path for is_path, _ in getters):
+                args = [value for _, value in getters],
             else:
-                args.append(arg)
-        return self.test(args)
+                def test(get):
+                    try:
+                        return op([get(value) if is_path else value
+                                   for is_path, value in getters])
+                    except TypeError as e:
+                        raise failed(e)
+                return test
+        else:
+            (is_path, value), = getters
+            if is_path:
+                def test(get):
+                    try:
+                        return op(get(value))
+                    except TypeError as e:
+                        raise failed(e)
+                return test
+            args = value,
+        # only literals, so the result is folded
+        try:
+            result = op(*args)
+        except TypeError as e:
+            raise self._failed(e)
+        return lambda get: result
 
 
 class All(Immutable):
@@ -67,6 +235,31 @@ class All(Immutable):
                 return False
         return True
 
+    def key(self):
+        return 'all', tuple(element.key() for element in self.elements)
+
+    def paths(self):
+        return frozenset().union(
+            *(element.paths() for element in self.elements))
+
+    def compile(self, compiler):
+        """ Returns a closure that tests all elements, like test().
+        """
+        tests = tuple(compiler.compile(element).test
+                      for element in self.elements)
+        if len(tests) == 1:
+            return tests[0]
+        elif len(tests) == 2:
+            a, b = tests
+            return lambda get: bool(a(get) and b(get))
+
+        def test(get):
+            for element in tests:
+                if not element(get):
+                    return False
+            return True
+        return test
+
 
 class Any(Immutable):
     """
@@ -82,6 +275,60 @@ class Any(Immutable):
                 return True
         return False
 
+    def key(self):
+        return 'any', tuple(element.key() for element in self.elements)
+
+    def paths(self):
+        return frozenset().union(
+            *(element.paths() for element in self.elements))
+
+    def compile(self, compiler):
+        """ Returns a closure that tests any element, like test().
+        """
+        tests = tuple(compiler.compile(element).test
+                      for element in self.elements)
+        if len(tests) == 1:
+            return tests[0]
+        elif len(tests) == 2:
+            a, b = tests
+            return lambda get: bool(a(get) or b(get))
+
+        def test(get):
+            for element in tests:
+                if element(get):
+                    return True
+            return False
+        return test
+
+
+def is_path(token):
+    """ Returns whether an argument token names a state element, rather than
+    being a literal.
+    """
+    scope, dot, _ = token.partition('.')
+    return bool(dot) and scope in STATE_SCOPES
+
+
+def missing(token):
+    """ Returns what the state element named by a path token reads as while
+    it isn't set: False for flags, 0 for counters and numbers, and None
+    otherwise.
+    """
+    tokens = token.split('.')
+    return MISSING.get(tokens[-2]) if len(tokens) > 2 else None
+
+
+def literal(token):
+    """ Returns the value of a literal argument token, i.e. a number for
+    numeric tokens and the token itself otherwise.
+    """
+    for type_ in (int, float):
+        try:
+            return type_(token)
+        except ValueError:
+            pass
+    return token
+
 
 def parse(schema):
     if type(schema) == str:
@@ -104,22 +351,22 @@ class Filter(Immutable):
 
 
 unary = {
-        '!': lambda x: not x[0]
+        '!': operator.not_
         }
 
 binary = {
-        '=': lambda x: x[0] == x[1],
-        '!=': lambda x: x[0] != x[1],
-        '>': lambda x: x[0] > x[1],
-        '>=': lambda x: x[0] >= x[1],
-        '<': lambda x: x[0] < x[1],
-        '<=': lambda x: x[0] <= x[1],
-        '': lambda x: x[0] > x[1],
+        '=': operator.eq,
+        '!=': operator.ne,
+        '>': operator.gt,
+        '>=': operator.ge,
+        '<': operator.lt,
+        '<=': operator.le,
+        '': operator.gt,
         }
 
 funcs = {
-        'largest': lambda x: sorted(x, reverse=True)[0],
-        'secondLargest': lambda x: sorted(x, reverse=True)[1],
-        'smallest': lambda x: sorted(x)[0],
-        'secondSmallest': lambda x: sorted(x)[1],
+        'largest': max,
+        'secondLargest': lambda x: heapq.nlargest(2, x)[1],
+        'smallest': min,
+        'secondSmallest': lambda x: heapq.nsmallest(2, x)[1],
         }
@@ -0,0 +1,83 @@
+import hashlib
+import json
+
+from coc import COCClass
+
+
+def object_key(schema):
+    """ Returns the key an object schema is identified by in a WorldDigest,
+    e.g. ``npc:npc_kiha``, or just the type for singletons like ``pc``.
+    """
+    try:
+        return '{0}:{1}'.format(schema['type'], schema['id'])
+    except KeyError:
+        return str(schema.get('type'))
+
+
+def object_hash(schema):
+    """ Returns a sha256 hex digest of an object schema, normalized so that
+    key order, YAML formatting and comments do not affect it.
+    """
+    normalized = json.dumps(schema, sort_keys=True, separators=(',', ':'),
+                            default=str)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class WorldDigest(COCClass):
+    """ A Merkle tree over the contents of a world schema. Every object schema
+    hashes to a leaf, every file to the hash of the leaves it contains, and
+    the world to the hash of all its files. Changing one file only requires
+    rehashing that file's objects.
+    """
+    def __init__(self):
+        super().__init__()
+        self.file_objects = dict()
+        self.file_hashes = dict()
+        self.root = None
+
+    def update_file(self, path, schemas):
+        """ (Re)hashes the object schemas loaded from ``path``.
+        """
+        objects = {
+            object_key(schema): object_hash(schema)
+            for schema in schemas
+            if isinstance(schema, dict)
+        }
+        self.file_objects[path] = objects
+        self.file_hashes[path] = hashlib.sha256(
+            ''.join(sorted(objects.values())).encode()).hexdigest()
+        self.root = None
+
+    def remove_file(self, path):
+        self.file_objects.pop(path, None)
+        self.file_hashes.pop(path, None)
+        self.root = None
+
+    def get_root(self):
+        """ Returns the world identity: a hash over every file hash. It only
+        depends on schema content, not on file paths or load order.
+        """
+        if self.root is None:
+            self.root = hashlib.sha256(
+                ''.join(sorted(self.file_hashes.values())).encode()
+            ).hexdigest()
+        return self.root
+
+    def get_object_hashes(self):
+        """ Returns the hash of every object in the world, keyed as by
+        object_key().
+        """
+        hashes = dict()
+        for objects in self.file_objects.values():
+            hashes.update(objects)
+        return hashes
+
+    def diff(self, object_hashes):
+        """ Returns the sorted keys of objects that were added, removed or
+        changed relative to a previously recorded ``object_hashes``.
+        """
+        current = self.get_object_hashes()
+        return sorted(
+            key for key in set(current) | set(object_hashes)
+            if current.get(key) != object_hashes.get(key)
+        )
@@ -8,6 +8,7 @@ class Dungeon(Locale, ABC):
     """ Represents a hostile visitable location with a room map, where each
     room contains one or more events, incl. puzzles, fights, and loot.
     """
+    __slots__ = ()
 
     def __init__(self, schema):
         super().__init__(schema)
@@ -1,13 +1,13 @@
 from coc import EventContext
-from coc.exceptions import ObjectNotFoundError, SchemaError
-
-entity_registry = dict()
+from coc.exceptions import SchemaError
 
 
 class Entity(EventContext):
     """ Common base class for all interactable entities in the world (monsters,
     npcs, etc.)
     """
+    __slots__ = ('event_path',)
+
     def __init__(self, schema):
         super().__init__(schema)
         state_defaults = {
@@ -36,16 +36,3 @@ class Entity(EventContext):
 
     def get_id(self):
         return self.id_
-
-
-def get_all():
-    return entity_registry.values()
-
-
-def get_by_id(id_):
-    try:
-        return entity_registry[id_]
-    except KeyError as e:
-        raise ObjectNotFoundError("entity ``" + id_ +
-                                  "`` was not found in the entity registry")\
-            from e
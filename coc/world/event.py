@@ -1,13 +1,17 @@
+import sys
 from abc import ABC, abstractmethod
 
 from coc import Immutable, SchemaError
-from coc.world.locale import get_locale_by_id
+from coc.player.statepath import compile_path
+from coc.world.template import Template, has_slots
 
 
 class Event(Immutable, ABC):
     """ Parent class for all event sequence items - represents a single step in
     an event stream.
     """
+    __slots__ = ('condition',)
+
     def __init__(self, schema, event, condition=None):
         super().__init__()
         self.condition = condition
@@ -26,6 +30,25 @@ class Event(Immutable, ABC):
         else:
             return self.condition.test(getfunc)
 
+    def successors(self):
+        """ Returns the ids of event streams this event may transfer control
+        to.
+        """
+        return []
+
+    def pack_text(self, builder):
+        """ Moves any prose held by this event into a text arena, through
+        an ArenaBuilder.
+        """
+        pass
+
+    def references(self):
+        """ Returns every world object this event refers to, as
+        ``(type, id)`` pairs, where type is one of ``event_stream``,
+        ``locale``, ``npc`` or ``monster``.
+        """
+        return [('event_stream', id_) for id_ in self.successors()]
+
     @staticmethod
     def construct(event_schema, eventstream):
         try:
@@ -38,8 +61,10 @@ class Event(Immutable, ABC):
 
 
 class EventBeginFight(Event):
+    __slots__ = ()
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
 
     def do(self, player, world, interface):
         raise NotImplementedError()
@@ -50,24 +75,37 @@ class EventBeginFight(Event):
 
 class EventText(Event):
     """ An event sequence item containing a block of text. This is the core
-    event sequence type for game content.
+    event sequence type for game content. Texts with ``{parameter}`` slots
+    are parsed into a Template over the parameters of their stream.
     """
+    __slots__ = ('text', 'template')
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         try:
             self.text = schema['text']
         except KeyError:
             raise SchemaError("{0} schema missing required field "
                               "``text``".format(type(self)))
+        self.template = None
+        if has_slots(self.text):
+            self.template = Template(self.text, event.parameters)
         self.initialized = True
 
     def do(self, player, world, interface):
-        interface.print(self.text)
+        if self.template is None:
+            interface.print(str(self.text))
+        else:
+            interface.print(self.template.render(player, world))
+
+    def pack_text(self, builder):
+        # a handle reads as the same text, so the event is unchanged
+        object.__setattr__(self, 'text', builder.add(self.text))
 
     def __dict__(self):
         return {
             'type': 'text',
-            'text': self.text
+            'text': str(self.text)
         }
 
 
@@ -75,10 +113,12 @@ class EventBranch(Event):
     """ An event item that jumps to another EventStream. This is the core
     unit of event chaining and flow control.
     """
+    __slots__ = ('event',)
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         try:
-            self.event = schema['event_id']
+            self.event = sys.intern(schema['event_id'])
         except KeyError:
             raise SchemaError("{0} schema missing required field "
                               "``event_id``".format(type(self)))
@@ -90,6 +130,9 @@ class EventBranch(Event):
             'id': self.event
         }
 
+    def successors(self):
+        return [self.event]
+
     def __dict__(self):
         return {
             'type': 'branch',
@@ -101,10 +144,14 @@ class EventPrompt(Event):
     """ An event that presents the user with a menu of choices and returns the
     selection, after optionally printing a prompt message.
     """
+    __slots__ = ('choices',)
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         try:
             self.choices = schema['choices']
+            for choice in self.choices:
+                choice['branch'] = sys.intern(choice['branch'])
         except KeyError:
             raise SchemaError("{0} schema missing required field "
                               "``choices``".format(type(self)))
@@ -123,6 +170,9 @@ class EventPrompt(Event):
         raise RuntimeError("interface a selection that wasn't in the list "
                            "of options")
 
+    def successors(self):
+        return [item['branch'] for item in self.choices]
+
     def __dict__(self):
         return {
             'type': 'prompt',
@@ -133,8 +183,10 @@ class EventPrompt(Event):
 class EventModifyResource(Event):
     """ An event that modifies existing states, e.g. counters or strings.
     """
+    __slots__ = ()
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         self.initialized = True
 
     def do(self, player, world, interface):
@@ -148,8 +200,10 @@ class EventAppendResource(Event):
     """ An event that adds a new resource to an existing set of states on an
     object, at the end of the list.
     """
+    __slots__ = ()
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         self.initialized = True
 
     def do(self, player, world, interface):
@@ -163,8 +217,10 @@ class EventPrependResource(Event):
     """ An event that adds a new resource to an existing set of states on an
     object, at the beginning of the list.
     """
+    __slots__ = ()
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         self.initialized = True
 
     def do(self, player, world, interface):
@@ -178,8 +234,10 @@ class EventRemoveResource(Event):
     """ An event that deletes a resource from the set of states on an existing
     object.
     """
+    __slots__ = ()
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         self.initialized = True
 
     def do(self, player, world, interface):
@@ -192,19 +250,21 @@ class EventRemoveResource(Event):
 class EventNpc(Event):
     """ An event that represents an encounter with an NPC.
     """
+    __slots__ = ('npc_id', 'events_path')
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         try:
-            self.npc_id = schema['npc_id']
+            self.npc_id = sys.intern(schema['npc_id'])
         except KeyError:
             raise SchemaError("{0} schema missing required field "
                               "``npc_id``".format(type(self)))
+        self.events_path = compile_path(
+            'world.npc.{0}.events'.format(self.npc_id))
         self.initialized = True
 
     def do(self, player, world, interface):
-        npc_events = player.get_state(
-            'world.npc.{0}.events'.format(self.npc_id)
-        )
+        npc_events = player.get_state(self.events_path)
         return [
             {
                 'type': 'eventstream',
@@ -214,6 +274,9 @@ class EventNpc(Event):
             in npc_events
         ]
 
+    def references(self):
+        return [('npc', self.npc_id)]
+
     def __dict__(self):
         return {
             'type': 'npc',
@@ -225,21 +288,25 @@ class EventImplode(Event):
     """ An event that de-registers the event from the current event
     context, thus preventing it from happening in the same way in the future.
     """
+    __slots__ = ('event',)
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         self.event = event.get_id()
         self.initialized = True
 
     def do(self, player, world, interface):
         context = player.current_locale
-        context_type = type(get_locale_by_id(context)).__name__.lower()
+        context_type = type(
+            world.get_locale_by_id(context)).__name__.lower()
         if context_type in ['town', 'dungeon']:
             context_type = 'locale'
-        state_path = 'world.{0}.{1}.events'.format(context_type,
-                                                   context)
+        state_path = compile_path('world.{0}.{1}.events'.format(context_type,
+                                                                context))
         registered = player.get_state(state_path)
-        player.set_state(state_path, [event for event in registered if event
-        != self.event])
+        if self.event in registered:
+            player.set_state(state_path, [event for event in registered
+                                          if event != self.event])
 
     def __dict__(self):
         return {
@@ -248,25 +315,25 @@ class EventImplode(Event):
 
 
 class EventRetire(Event):
-    """ An event that de-registers the event from the current event
-    context, thus preventing it from happening in the same way in the future.
+    """ An event that de-registers the event from every event context that
+    registers it, thus preventing it from happening again anywhere.
     """
+    __slots__ = ('event',)
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         self.event = event.get_id()
         self.initialized = True
 
     def do(self, player, world, interface):
-        raise NotImplementedError()
-        # TODO: figure out a reasonably efficient means to scan all
-        #  EventContexts and remove this context from all of them.
-        for context_type in ['locale', 'npc', 'monster']:
-            pass
-        state_path = 'world.{0}.{1}.events'.format(context_type,
-                                                   context)
-        registered = player.get_state(state_path)
-        player.set_state(state_path, [event for event in registered if event
-                                      != self.event])
+        # the player's event index knows which contexts register the event,
+        # so there is no need to scan them all
+        for context_type, context in list(player.event_contexts(self.event)):
+            state_path = compile_path('world.{0}.{1}.events'.format(
+                context_type, context))
+            registered = player.get_state(state_path)
+            player.set_state(state_path, [event for event in registered
+                                          if event != self.event])
 
     def __dict__(self):
         return {
@@ -277,6 +344,8 @@ class EventRetire(Event):
 class EventSetFlag(Event):
     """ An event that enables a state flag
     """
+    __slots__ = ('scope', 'flag_id', 'flag_state_path')
+
     supported_scopes = [
         'npc',
         'monster',
@@ -285,7 +354,7 @@ class EventSetFlag(Event):
     ]
 
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         path_prefix = None
         for key in schema:
             if key in self.supported_scopes:
@@ -306,7 +375,8 @@ class EventSetFlag(Event):
         except KeyError:
             raise SchemaError("{0} schema missing required field "
                               "``flag_id``".format(type(self)))
-        self.flag_state_path = '.'.join([path_prefix, 'flags', self.flag_id])
+        self.flag_state_path = compile_path(
+            '.'.join([path_prefix, 'flags', self.flag_id]))
         self.initialized = True
 
     def do(self, player, world, interface):
@@ -327,6 +397,8 @@ class EventSetFlag(Event):
 class EventClearFlag(Event):
     """ An event that enables a state flag
     """
+    __slots__ = ('scope', 'flag_id', 'flag_state_path')
+
     supported_scopes = [
         'npc',
         'monster',
@@ -335,7 +407,7 @@ class EventClearFlag(Event):
     ]
 
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
         path_prefix = None
         for key in schema:
             if key in self.supported_scopes:
@@ -356,7 +428,8 @@ class EventClearFlag(Event):
         except KeyError:
             raise SchemaError("{0} schema missing required field "
                               "``flag_id``".format(type(self)))
-        self.flag_state_path = '.'.join([path_prefix, 'flags', self.flag_id])
+        self.flag_state_path = compile_path(
+            '.'.join([path_prefix, 'flags', self.flag_id]))
         self.initialized = True
 
     def do(self, player, world, interface):
@@ -375,8 +448,10 @@ class EventClearFlag(Event):
 
 
 class EventDoTrigger(Event):
+    __slots__ = ()
+
     def __init__(self, schema, event, condition=None):
-        super().__init__(schema, condition)
+        super().__init__(schema, event, condition)
 
     def do(self, player, world, interface):
         raise NotImplementedError()
@@ -386,22 +461,29 @@ class EventDoTrigger(Event):
 
 
 class EventSetEncounterEvent(Event):
+    __slots__ = ('npc', 'event_id', 'encounter_path')
+
     def __init__(self, schema, event, condition=None):
+        super().__init__(schema, event, condition)
         try:
-            self.npc = schema['npc']
+            self.npc = sys.intern(schema['npc'])
         except KeyError:
             raise SchemaError("{0} schema missing required field "
                               "``npc``".format(type(self)))
         try:
-            self.event_id = schema['event_id']
+            self.event_id = sys.intern(schema['event_id'])
         except KeyError:
             raise SchemaError("{0} schema missing required field "
                               "``event_id``".format(type(self)))
-        super().__init__(schema, condition)
+        self.encounter_path = compile_path(
+            'world.npc.{0}.encounter_event'.format(self.npc))
+        self.initialized = True
 
     def do(self, player, world, interface):
-        player.set_state('world.npc.{0}.encounter_event'.format(self.npc),
-                         self.event_id)
+        player.set_state(self.encounter_path, self.event_id)
+
+    def references(self):
+        return [('npc', self.npc), ('event_stream', self.event_id)]
 
     def __dict__(self):
         return {
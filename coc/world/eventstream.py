@@ -1,17 +1,24 @@
+import sys
+
 from coc import Immutable
-from coc.exceptions import LoadError, ObjectNotFoundError, SchemaError
+from coc.exceptions import SchemaError
 from coc.world.event import Event
-
-eventstream_registry = dict()
+from coc.world.template import Parameters
 
 
 class EventStream(Immutable):
     """ Represents a narrative sequence, including conditional components and
     usually terminating at a conditional branch, a fight, or a decision menu.
     """
+    __slots__ = ('id_', 'events', 'parameters', 'tests')
+    # compiled once the world's state layout is known
+    mutable = ('tests',)
+
     def __init__(self, schema):
         super().__init__()
-        self.id_ = schema['id']
+        self.id_ = sys.intern(schema['id'])
+        # shared by the templates of the stream's texts
+        self.parameters = Parameters(schema.get('parameters'))
         try:
             self.events = [
                     Event.construct(item, self) for item in schema['events']
@@ -20,19 +27,74 @@ class EventStream(Immutable):
             raise SchemaError("encountered an unknown event type ``{0}`` "
                               "while attempting to load event ``{1}``"
                               .format(e.args[0], schema['id']))
-        global eventstream_registry
-        if schema['id'] in eventstream_registry:
-            raise LoadError("attempted to load event_stream ``{0}`` but that "
-                            "event id already exists".format(schema['id']))
+        self.tests = None
         self.initialized = True
-        eventstream_registry[self.id_] = self
+
+    def __getstate__(self):
+        # compiled conditions are closures, so they are compiled again after
+        # loading
+        return None, {'initialized': self.initialized, 'id_': self.id_,
+                      'events': self.events, 'parameters': self.parameters}
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        object.__setattr__(self, 'tests', None)
 
     def get_id(self):
         return self.id_
 
-    def run(self, state_func):
+    def get_successors(self):
+        """ Returns the ids of all event streams this stream may transfer
+        control to, in the order they appear.
+        """
+        successors = list()
         for item in self.events:
-            if item.check_condition(state_func):
+            for id_ in item.successors():
+                if id_ not in successors:
+                    successors.append(id_)
+        return successors
+
+    def get_references(self):
+        """ Returns every world object referred to by the events in this
+        stream, as ``(type, id)`` pairs.
+        """
+        references = list()
+        for item in self.events:
+            for reference in item.references():
+                if reference not in references:
+                    references.append(reference)
+        return references
+
+    def compile(self, compiler):
+        """ Compiles the condition of each event with a conditional.Compiler,
+        which checks the state paths they test against the world's declared
+        state. Raises SchemaError for state the world doesn't declare.
+        The parameters of the stream's texts are compiled too; those that
+        can't be resolved are kept in the ``problems`` of ``parameters``.
+        """
+        self.parameters.compile(compiler)
+        self.tests = tuple(
+            None if item.condition is None else
+            compiler.compile(item.condition) for item in self.events)
+
+    def run(self, state_func, memo=None):
+        """ Yields the events whose conditions hold. Compiled conditions are
+        tested through the player's ConditionMemo ``memo``, if given, so
+        they are only tested again once the state they read changes.
+        """
+        tests = self.tests
+        if tests is None:
+            for item in self.events:
+                if item.check_condition(state_func):
+                    yield item
+            return
+        for item, test in zip(self.events, tests):
+            if test is None:
+                yield item
+            elif memo is not None:
+                if memo.test(test, state_func):
+                    yield item
+            elif test.test(state_func):
                 yield item
 
     def __repr__(self):
@@ -43,21 +105,3 @@ class EventStream(Immutable):
             ]
         })
 
-
-def get_all_eventstreams():
-    return eventstream_registry.values()
-
-
-def get_eventstream_by_id(id_):
-    try:
-        return eventstream_registry[id_]
-    except KeyError as e:
-        raise ObjectNotFoundError("event ``" + id_ +
-                                  "`` was not found in the event registry"
-                                  ) from e
-
-
-def is_eventstream_loaded(id_):
-    return id_ in eventstream_registry
-
-
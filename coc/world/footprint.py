@@ -0,0 +1,27 @@
+import gc
+import sys
+import types
+
+# objects shared with the rest of the interpreter, which a world doesn't own
+_excluded_types = (type, types.ModuleType, types.FunctionType,
+                   types.BuiltinFunctionType, types.MethodType)
+
+
+def report(*roots):
+    """ Walks every object reachable from ``roots`` and returns a dict that
+    maps each type name to the ``(count, bytes)`` of its instances. Objects
+    that are reachable more than once, like interned ids, are counted once.
+    """
+    totals = dict()
+    seen = set()
+    pending = list(roots)
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, _excluded_types):
+            continue
+        seen.add(id(obj))
+        name = type(obj).__name__
+        count, size = totals.get(name, (0, 0))
+        totals[name] = (count + 1, size + sys.getsizeof(obj))
+        pending.extend(gc.get_referents(obj))
+    return totals
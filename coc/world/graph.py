@@ -0,0 +1,107 @@
+from array import array
+
+from coc import COCClass
+from coc.exceptions import ObjectNotFoundError
+
+
+class WorldGraph(COCClass):
+    """ An index of every reference between the event streams, locales, npcs
+    and monsters of a world. Each object is a node with an integer id, and
+    references are kept as forward and reverse adjacency arrays, so that
+    lookups in either direction cost one slice.
+    Referenced ids that no object defines are nodes too, marked undefined.
+    """
+    def __init__(self, objects):
+        """ ``objects`` maps ``(type, id)`` node keys of every defined object
+        to a list of the node keys it refers to.
+        """
+        super().__init__()
+        keys = set(objects)
+        for references in objects.values():
+            keys.update(references)
+        self.keys = sorted(keys)
+        self.node_ids = {key: node for node, key in enumerate(self.keys)}
+        self.defined = bytearray(
+            key in objects for key in self.keys)
+        edges = sorted({
+            (self.node_ids[source], self.node_ids[target])
+            for source, references in objects.items()
+            for target in references
+        })
+        self.offsets, self.targets = _pack(len(self.keys), edges)
+        self.reverse_offsets, self.sources = _pack(
+            len(self.keys), sorted((b, a) for a, b in edges))
+
+    def node(self, type_, id_):
+        try:
+            return self.node_ids[(type_, id_)]
+        except KeyError:
+            raise ObjectNotFoundError("{0} ``{1}`` is not in the world graph"
+                                      .format(type_, id_))
+
+    def references(self, type_, id_):
+        """ Returns the keys of all objects the given object refers to.
+        """
+        node = self.node(type_, id_)
+        return [self.keys[target] for target in
+                self.targets[self.offsets[node]:self.offsets[node + 1]]]
+
+    def referrers(self, type_, id_):
+        """ Returns the keys of all objects that refer to the given object,
+        e.g. every event stream that branches to it.
+        """
+        node = self.node(type_, id_)
+        return [self.keys[source] for source in
+                self.sources[self.reverse_offsets[node]:
+                             self.reverse_offsets[node + 1]]]
+
+    def reachable(self, type_, id_):
+        """ Returns the keys of all defined objects that can be reached by
+        following references from the given object, including itself.
+        """
+        start = self.node(type_, id_)
+        seen = bytearray(len(self.keys))
+        seen[start] = 1
+        queue = [start]
+        while queue:
+            node = queue.pop()
+            for target in self.targets[self.offsets[node]:
+                                       self.offsets[node + 1]]:
+                if not seen[target]:
+                    seen[target] = 1
+                    queue.append(target)
+        return {self.keys[node] for node in range(len(self.keys))
+                if seen[node] and self.defined[node]}
+
+    def dangling(self):
+        """ Returns ``(source, target)`` key pairs for every reference to an
+        object that is not defined in the world.
+        """
+        return [
+            (self.keys[source], self.keys[target])
+            for target in range(len(self.keys)) if not self.defined[target]
+            for source in self.sources[self.reverse_offsets[target]:
+                                       self.reverse_offsets[target + 1]]
+        ]
+
+    def unreachable(self, type_, id_):
+        """ Returns the keys of all defined objects that can never be reached
+        from the given object, i.e. dead content when starting there.
+        """
+        reachable = self.reachable(type_, id_)
+        return [key for node, key in enumerate(self.keys)
+                if self.defined[node] and key not in reachable]
+
+
+def _pack(node_count, edges):
+    """ Packs a sorted list of ``(source, target)`` node pairs into an offsets
+    array and a targets array, where the targets of node ``n`` are
+    ``targets[offsets[n]:offsets[n + 1]]``.
+    """
+    offsets = array('l', [0] * (node_count + 1))
+    targets = array('l', [target for _, target in edges])
+    for source, _ in edges:
+        offsets[source + 1] += 1
+    for node in range(node_count):
+        offsets[node + 1] += offsets[node]
+    return offsets, targets
@@ -1,12 +1,12 @@
 from coc.world.entity import Entity
-from coc.exceptions import ObjectNotFoundError, SchemaError
-
-monster_registry = dict()
+from coc.exceptions import SchemaError
 
 
 class Monster(Entity):
     """ Common base class for all interactible entities in the world (monsters,
     """
+    __slots__ = ()
+
     def __init__(self, schema):
         super().__init__(schema)
         try:
@@ -17,16 +17,3 @@ class Monster(Entity):
                               .format(type(self), e.args[0]),
                               schema=schema) from e
         self.initialized = True
-
-
-def get_all():
-    return monster_registry.values()
-
-
-def get_by_id(id_):
-    try:
-        return monster_registry[id_]
-    except KeyError as e:
-        raise ObjectNotFoundError("monster ``" + id_ +
-                                  "`` was not found in the monster registry"
-                                  ) from e
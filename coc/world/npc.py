@@ -1,8 +1,7 @@
-from coc.exceptions import ObjectNotFoundError, SchemaError
-from coc.world.entity import Entity
-from coc.world.eventstream import get_eventstream_by_id
+import sys
 
-npc_registry = dict()
+from coc.exceptions import SchemaError
+from coc.world.entity import Entity
 
 
 class NPC(Entity):
@@ -10,6 +9,8 @@ class NPC(Entity):
     combat with a dialogueable character is implemented as an event transition
     to a fight with a Monster object that is only semantically associated.
     """
+    __slots__ = ()
+
     def __init__(self, schema):
         def load_flags():
             flags = dict()
@@ -88,16 +89,7 @@ class NPC(Entity):
         def load_events():
             events = list()
             try:
-                event_id = schema['state']['encounter_event']
-                try:
-                    get_eventstream_by_id(event_id)
-                except ObjectNotFoundError as e:
-                    raise ObjectNotFoundError(
-                        "tried to load npc object (id ``{0}``) with a "
-                        "nonexistant event_id in its event registry - "
-                        "requested id was ``{1}``"
-                        .format(self.id_, event_id),
-                        schema=schema) from e
+                event_id = sys.intern(schema['state']['encounter_event'])
                 events.append(event_id)
             except KeyError as e:
                 if e.args[0] == 'events':
@@ -112,7 +104,7 @@ class NPC(Entity):
             return events
         super().__init__(schema)
         try:
-            self.id_ = schema['id']
+            self.id_ = sys.intern(schema['id'])
         except KeyError:
             raise SchemaError("tried to load town object with no id field",
                               schema=schema)
@@ -123,17 +115,3 @@ class NPC(Entity):
         self.state['strings'] = load_strings()
         self.state['events'] = load_events()
         self.initialized = True
-        npc_registry[self.id_] = self
-
-
-def get_all():
-    return npc_registry.values()
-
-
-def get_by_id(id_):
-    try:
-        return npc_registry[id_]
-    except KeyError as e:
-        raise ObjectNotFoundError("npc ``" + id_ +
-                                  "`` was not found in the npc registry")\
-            from e
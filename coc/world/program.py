@@ -0,0 +1,142 @@
+from coc import COCClass
+from coc.exceptions import IncorrectObjectTypeError
+from coc.world.event import EventBranch
+
+# opcodes of compiled event streams. Every instruction is an
+# ``(opcode, argument, offset)`` tuple:
+#   TEST: skips the next ``offset`` instructions unless the compiled
+#       condition ``argument`` holds
+#   DO: does the event ``argument``
+#   PUSH: pushes the address ``argument`` onto the stream stack
+#   JUMP: continues at the address ``argument``
+#   END: ends the stream
+#   PUSH_ID, JUMP_ID: PUSH and JUMP to the event stream with id
+#       ``argument``, which are linked to its address when first run
+TEST, DO, PUSH, JUMP, END, PUSH_ID, JUMP_ID = range(7)
+
+
+class Program(COCClass):
+    """ The event streams of a world, compiled into one flat list of
+    instructions. Conditional events become tests that jump over them, and
+    branches become pushes of integer addresses. A branch that ends a
+    stream is compiled as a jump, and addresses of streams that only
+    branch on are resolved to the address they branch to, so chains of
+    branches run as one stream.
+    Streams are compiled when their address is first asked for, and
+    branches are linked when first run, so a lazily loaded world is only
+    loaded as far as it is played.
+    """
+    def __init__(self, world):
+        super().__init__()
+        self.world = world
+        self.code = list()
+        # the address of each compiled stream, and the stream at each one
+        self.addresses = dict()
+        self.streams = dict()
+        # the address of the stream run() is running, or ran last
+        self.current = None
+
+    def address(self, stream_id):
+        """ Returns the address that the event stream ``stream_id`` starts
+        at, compiling it if needed.
+        """
+        address = self.addresses.get(stream_id)
+        if address is None:
+            address = self.addresses[stream_id] = self._compile(
+                self.world.get_eventstream_by_id(stream_id))
+            # streams that only branch on start where their target does
+            seen = {stream_id}
+            op, target, _ = self.code[address]
+            while op == JUMP_ID and target not in seen:
+                seen.add(target)
+                address = self.address(target)
+                op, target, _ = self.code[address]
+            self.addresses[stream_id] = address
+        return address
+
+    def stream_at(self, address):
+        """ Returns the id of the event stream compiled at ``address``.
+        """
+        return self.streams[address]
+
+    def run(self, address, player, interface, streams, locales, enter=None):
+        """ Runs the compiled stream at ``address`` for ``player``. The
+        addresses of the streams it leads to are pushed onto ``streams``,
+        and the ids of locales onto ``locales``. Streams it runs on into
+        are run as part of it; ``enter``, if given, is called with the
+        address of each stream as it starts, this one included.
+        """
+        code = self.code
+        addresses = self.addresses
+        world = self.world
+        state_func = player.get_state
+        memo = player.conditions
+        self.current = address
+        if enter is not None:
+            enter(address)
+        while True:
+            op, argument, offset = code[address]
+            if op == DO:
+                address += 1
+                push = argument.do(player, world, interface)
+                if push is None:
+                    continue
+                if type(push) == dict and push['type'] == 'eventstream':
+                    target = addresses.get(push['id'])
+                    streams.append(self.address(push['id'])
+                                   if target is None else target)
+                else:
+                    self._push(push, streams, locales)
+            elif op == TEST:
+                if memo.test(argument, state_func):
+                    address += 1
+                else:
+                    address += 1 + offset
+            elif op == PUSH:
+                streams.append(argument)
+                address += 1
+            elif op == JUMP:
+                address = self.current = argument
+                if enter is not None:
+                    enter(address)
+            elif op == END:
+                return
+            else:
+                # link the branch, and run it again
+                code[address] = (PUSH if op == PUSH_ID else JUMP,
+                                 self.address(argument), 0)
+
+    def _compile(self, stream):
+        address = len(self.code)
+        code = list()
+        for item, test in zip(stream.events, stream.tests):
+            if test is not None:
+                code.append((TEST, test, 1))
+            if type(item) == EventBranch:
+                code.append((PUSH_ID, item.event, 0))
+            else:
+                code.append((DO, item, 0))
+        if code and code[-1][0] == PUSH_ID and \
+                (len(code) == 1 or code[-2][0] != TEST):
+            # pushing a stream and then ending is running it next
+            code[-1] = (JUMP_ID, code[-1][1], 0)
+        else:
+            code.append((END, None, 0))
+        self.code.extend(code)
+        self.streams[address] = stream.id_
+        return address
+
+    def _push(self, push, streams, locales):
+        """ Pushes what an event returned it leads to.
+        """
+        if not isinstance(push, list):
+            push = [push]
+        for item in push:
+            if item['type'] == 'locale':
+                locales.append(item['id'])
+            elif item['type'] == 'eventstream':
+                streams.append(self.address(item['id']))
+            else:
+                raise IncorrectObjectTypeError(
+                    "an event returned an unsupported next object type "
+                    "``{0}``".format(item['type']))
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict
+
+from coc import COCClass
+from coc.world import bundle
+
+REGISTRY_CAPACITY = 256
+
+
+class WorldStore(COCClass):
+    """ An SQLite index of every object in a compiled world. Objects are kept
+    pickled, one row each, and only unpickled when something asks for them.
+    """
+    def __init__(self, store_file):
+        super().__init__()
+        self.store_file = store_file
+        self.connection = sqlite3.connect(store_file)
+
+    def get_meta(self, key):
+        try:
+            row = self.connection.execute(
+                'SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        except sqlite3.DatabaseError:
+            return None
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def has(self, kind, id_):
+        return self.connection.execute(
+            'SELECT 1 FROM objects WHERE kind = ? AND id = ?',
+            (kind, id_)).fetchone() is not None
+
+    def fetch(self, kind, id_):
+        """ Returns the object ``id_`` of the given kind and the ids of the
+        event streams it leads to. Raises KeyError if there is no such object.
+        """
+        row = self.connection.execute(
+            'SELECT value, successors FROM objects WHERE kind = ? AND id = ?',
+            (kind, id_)).fetchone()
+        if row is None:
+            raise KeyError(id_)
+        return pickle.loads(row[0]), row[1].split()
+
+    def fetch_many(self, kind, ids):
+        """ Returns the objects in ``ids`` of the given kind, keyed by id.
+        Ids that are not in the store are left out.
+        """
+        if not ids:
+            return {}
+        rows = self.connection.execute(
+            'SELECT id, value FROM objects WHERE kind = ? AND id IN ({0})'
+            .format(', '.join('?' * len(ids))),
+            [kind] + list(ids))
+        return {id_: pickle.loads(value) for id_, value in rows}
+
+    def ids(self, kind):
+        return [row[0] for row in self.connection.execute(
+            'SELECT id FROM objects WHERE kind = ? ORDER BY rowid', (kind,))]
+
+    def count(self, kind):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM objects WHERE kind = ?', (kind,)
+        ).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class StoreRegistry(COCClass):
+    """ Stands in for one of a World's object registries, keeping at most
+    ``capacity`` objects from a WorldStore resident in LRU order.
+    Fetching an event stream also prefetches the streams it branches to, as
+    those are the likely next requests.
+    """
+    def __init__(self, store, kind, capacity=REGISTRY_CAPACITY):
+        super().__init__()
+        self.store = store
+        self.kind = kind
+        self.capacity = capacity
+        self.resident = OrderedDict()
+
+    def __getitem__(self, id_):
+        try:
+            obj = self.resident[id_]
+        except KeyError:
+            obj, successors = self.store.fetch(self.kind, id_)
+            self.prefetch(successors)
+            self.resident[id_] = obj
+            self._evict()
+        self.resident.move_to_end(id_)
+        return obj
+
+    def __setitem__(self, id_, obj):
+        self.resident[id_] = obj
+        self._evict()
+
+    def __contains__(self, id_):
+        return id_ in self.resident or self.store.has(self.kind, id_)
+
+    def __len__(self):
+        return self.store.count(self.kind)
+
+    def keys(self):
+        return self.store.ids(self.kind)
+
+    def values(self):
+        return [self[id_] for id_ in self.keys()]
+
+    def prefetch(self, ids):
+        missing = [id_ for id_ in ids if id_ not in self.resident]
+        for id_, obj in self.store.fetch_many(self.kind, missing).items():
+            self.resident[id_] = obj
+        self._evict()
+
+    def _evict(self):
+        while len(self.resident) > self.capacity:
+            self.resident.popitem(last=False)
+
+
+def store_path(cache_dir, schema_root):
+    """ Returns the store file used to index the world at ``schema_root``.
+    """
+    key = hashlib.sha256(os.path.abspath(schema_root).encode()).hexdigest()
+    return os.path.join(cache_dir, key[:16] + os.extsep + 'sqlite')
+
+
+def write(store_file, world, arena_file=None):
+    """ Indexes ``world`` and the contents of its object registries into a
+    new store at ``store_file``, replacing any existing one atomically.
+    ``arena_file`` is the text arena the world's events refer to, if any.
+    """
+    os.makedirs(os.path.dirname(store_file) or '.', exist_ok=True)
+    tmp_file = store_file + os.extsep + 'tmp'
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+    connection = sqlite3.connect(tmp_file)
+    with connection:
+        connection.execute(
+            'CREATE TABLE meta (key TEXT PRIMARY KEY, value BLOB)')
+        connection.execute(
+            'CREATE TABLE objects (kind TEXT, id TEXT, value BLOB, '
+            'successors TEXT, PRIMARY KEY (kind, id))')
+        registries = dict(world.registries)
+        try:
+            # the objects get a row each, so the world is stored without them
+            world.registries.update({kind: dict() for kind in registries})
+            world_value = pickle.dumps(world)
+        finally:
+            world.registries.update(registries)
+        connection.executemany(
+            'INSERT INTO meta VALUES (?, ?)', [
+                ('header', pickle.dumps(bundle.source_header(world))),
+                ('world', world_value),
+                ('arena', pickle.dumps(arena_file)),
+            ])
+        for kind, registry in registries.items():
+            connection.executemany(
+                'INSERT INTO objects VALUES (?, ?, ?, ?)', [
+                    (kind, id_, pickle.dumps(obj), ' '.join(
+                        obj.get_successors() if kind == 'event_stream'
+                        else []))
+                    for id_, obj in registry.items()
+                ])
+    connection.close()
+    os.replace(tmp_file, store_file)
+
+
+def read(store_file, capacity=REGISTRY_CAPACITY):
+    """ Opens the store at ``store_file``, and returns the World stored in it
+    with lazy registries backed by the store. Returns None if the store is
+    missing or stale with respect to its schema files.
+    """
+    if not os.path.exists(store_file):
+        return None
+    store = WorldStore(store_file)
+    header = store.get_meta('header')
+    arena_file = store.get_meta('arena')
+    if header is None or not bundle.is_current(header) or \
+            (arena_file is not None and not os.path.exists(arena_file)):
+        # objects are unpickled lazily, so a missing arena must be caught now
+        store.close()
+        return None
+    world = store.get_meta('world')
+    world.registries.update({
+        kind: StoreRegistry(store, kind, capacity)
+        for kind in world.registries
+    })
+    return world
@@ -0,0 +1,119 @@
+from array import array
+
+from coc import COCClass
+
+# the typed scopes of player state, in slot kind order
+KINDS = ('flags', 'counters', 'numbers', 'strings')
+FLAGS, COUNTERS, NUMBERS, STRINGS = range(len(KINDS))
+# segments also hold the strings of their slots that aren't in the string
+# table, after the values of each kind
+LOCAL_STRINGS = len(KINDS)
+# the string table index of slots whose string is held by the segment
+LOCAL = -1
+
+
+class SymbolTable(COCClass):
+    """ Assigns a slot to every flag, counter, number and string that a state
+    declares, e.g. ``world.npc.npc_kiha.flags.met``, so that player state can
+    keep their values in typed arrays instead of nested dicts.
+    Slots are grouped into one segment per scope that declares them (``pc``,
+    ``world.npc.npc_kiha``, ...), so players can share the default values of
+    a segment until they change one of them. Segments and slots are assigned
+    in sorted order, so a table built from the same declarations always has
+    the same layout.
+    Strings are stored as indices into a table of the interned defaults,
+    which is shared by all states using this symbol table and doesn't change
+    once it is built. Other strings are held by the segments of the states
+    that set them, one per slot.
+    """
+    def __init__(self, state):
+        """ ``state`` is a nested state dict, like a world state template;
+        every entry of a ``flags``, ``counters``, ``numbers`` or ``strings``
+        scope in it gets a slot, and its value becomes the slot's default.
+        Everything else in it becomes the shared ``base`` of player state.
+        """
+        super().__init__()
+        self.slots = dict()
+        self.scopes = list()
+        self.names = list()
+        self.defaults = list()
+        self.string_values = list()
+        self.string_ids = dict()
+        self.segment_ids = dict()
+        self.base = self._assign(state, ())
+
+    def _intern(self, value):
+        """ Returns the string table index of ``value``, adding it if it is
+        new.
+        """
+        try:
+            return self.string_ids[value]
+        except KeyError:
+            index = self.string_ids[value] = len(self.string_values)
+            self.string_values.append(value)
+            return index
+
+    def declares(self, path):
+        """ Returns whether the state holds an element at the dotted path
+        ``path``, typed or not.
+        """
+        if path in self.slots:
+            return True
+        scope = self.base
+        for token in path.split('.'):
+            if type(scope) != dict or token not in scope:
+                return False
+            scope = scope[token]
+        return True
+
+    def segment(self, scope_tokens):
+        """ Returns the segment of the scope at ``scope_tokens``, or None if
+        it declares no typed state.
+        """
+        return self.segment_ids.get(scope_tokens)
+
+    def _assign(self, scope, tokens):
+        """ Assigns slots to the typed state in ``scope``, and returns a copy
+        of it without them.
+        """
+        untyped = dict()
+        for key in sorted(scope):
+            value = scope[key]
+            if type(value) != dict:
+                untyped[key] = value
+            elif key in KINDS:
+                for name in sorted(value):
+                    self._add_slot(tokens, KINDS.index(key), name,
+                                   value[name])
+            else:
+                untyped[key] = self._assign(value, tokens + (key,))
+        return untyped
+
+    def _add_slot(self, scope_tokens, kind, name, default):
+        try:
+            segment = self.segment_ids[scope_tokens]
+        except KeyError:
+            segment = self.segment_ids[scope_tokens] = len(self.scopes)
+            self.scopes.append(scope_tokens)
+            self.names.append(tuple(list() for _ in KINDS))
+            self.defaults.append((bytearray(), array('q'), array('d'),
+                                  array('l'), list()))
+        names = self.names[segment][kind]
+        values = self.defaults[segment][kind]
+        offset = len(names)
+        names.append(name)
+        self.slots['.'.join(scope_tokens + (KINDS[kind], name))] = \
+            (segment, kind, offset)
+        if kind == FLAGS:
+            if offset % 8 == 0:
+                values.append(0)
+            if default:
+                values[offset >> 3] |= 1 << (offset & 7)
+        elif kind == COUNTERS:
+            values.append(int(default or 0))
+        elif kind == NUMBERS:
+            values.append(float(default or 0.0))
+        else:
+            values.append(
+                self._intern('' if default is None else str(default)))
+            self.defaults[segment][LOCAL_STRINGS].append(None)
@@ -0,0 +1,332 @@
+import string
+from abc import abstractmethod
+
+from coc import Immutable
+from coc.exceptions import SchemaError
+from coc.player.statepath import compile_path
+from coc.world import conditional
+
+# renders kept per template before its cache is emptied
+CACHE_SIZE = 64
+
+_formatter = string.Formatter()
+
+
+def has_slots(text):
+    """ Returns whether ``text`` has any ``{parameter}`` slots.
+    """
+    return '{' in text or '}' in text
+
+
+class Template(Immutable):
+    """ A text with ``{parameter}`` slots, parsed once into its literal
+    segments and the keys of its slots. Renders are cached by the values of
+    its parameters, so a scene that is seen again is not rendered again.
+    """
+    __slots__ = ('segments', 'keys', 'parameters', 'compiler', 'resolvers',
+                 'renders')
+    mutable = ('compiler', 'resolvers', 'renders')
+
+    def __init__(self, text, parameters):
+        super().__init__()
+        segments = list()
+        keys = list()
+        literal = ''
+        try:
+            for text_, key, spec, conversion in _formatter.parse(text):
+                literal += text_
+                if key is None:
+                    continue
+                if spec or conversion:
+                    raise SchemaError("text parameter ``{0}`` may not be "
+                                      "formatted".format(key))
+                if key not in parameters.schemas:
+                    raise SchemaError("text refers to the undefined "
+                                      "parameter ``{0}``".format(key))
+                segments.append(literal)
+                keys.append(key)
+                literal = ''
+        except ValueError as e:
+            raise SchemaError("unable to parse text parameters: {0}"
+                              .format(str(e)), schema={'text': text})
+        segments.append(literal)
+        self.segments = tuple(segments)
+        self.keys = tuple(keys)
+        self.parameters = parameters
+        self.compiler = None
+        self.resolvers = None
+        self.renders = dict()
+        self.initialized = True
+
+    def render(self, player, world):
+        """ Returns the text with the parameters resolved for ``player``.
+        Parameters that can't be resolved in ``world`` read as their slots.
+        """
+        if world.conditions is not self.compiler:
+            self.resolvers = self.parameters.resolvers_of(self.keys,
+                                                          world.conditions)
+            self.compiler = world.conditions
+        get = player.get_state
+        memo = player.conditions
+        values = tuple([resolve(get, memo) for resolve in self.resolvers])
+        text = self.renders.get(values)
+        if text is None:
+            if len(self.renders) >= CACHE_SIZE:
+                self.renders = dict()
+            segments = self.segments
+            parts = [segments[0]]
+            for value, segment in zip(values, segments[1:]):
+                parts.append(str(value))
+                parts.append(segment)
+            text = self.renders[values] = ''.join(parts)
+        return text
+
+    def __getstate__(self):
+        return None, {'initialized': self.initialized,
+                      'segments': self.segments, 'keys': self.keys,
+                      'parameters': self.parameters}
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        object.__setattr__(self, 'compiler', None)
+        object.__setattr__(self, 'resolvers', None)
+        object.__setattr__(self, 'renders', dict())
+
+
+class Parameters(Immutable):
+    """ The ``parameters`` block of an event stream, shared by the templates
+    of its texts. Each parameter is compiled into a resolver against the
+    world's state along with the stream, and compiled again for a reloaded
+    world. ``problems`` holds why each parameter that can't be resolved
+    wasn't; those read as their slot, e.g. ``{key}``, instead.
+    """
+    __slots__ = ('schemas', 'compiler', 'resolvers', 'problems')
+    mutable = ('compiler', 'resolvers', 'problems')
+
+    def __init__(self, schemas):
+        super().__init__()
+        self.schemas = dict()
+        for schema in schemas or []:
+            try:
+                self.schemas[schema['key']] = schema
+            except (KeyError, TypeError):
+                raise SchemaError("text parameter schema missing required "
+                                  "field ``key``", schema=schema)
+        self.compiler = None
+        self.resolvers = dict()
+        self.problems = dict()
+        self.initialized = True
+
+    def compile(self, compiler):
+        """ Compiles every parameter with the conditional.Compiler
+        ``compiler``. Parameters that can't be compiled against its world
+        are kept in ``problems`` rather than raising SchemaError, and
+        resolve to their slot.
+        """
+        resolvers = dict()
+        problems = dict()
+        for key, schema in self.schemas.items():
+            try:
+                resolvers[key] = Parameter.construct(schema).compile(
+                    compiler)
+            except SchemaError as e:
+                problems[key] = "unable to resolve text parameter " \
+                                "``{0}``: {1}".format(key, str(e))
+                resolvers[key] = _slot(key)
+        self.compiler = compiler
+        self.resolvers = resolvers
+        self.problems = problems
+
+    def resolvers_of(self, keys, compiler):
+        """ Returns the resolvers of the parameters ``keys``, compiling them
+        first if they weren't compiled with ``compiler``.
+        """
+        if compiler is not self.compiler:
+            self.compile(compiler)
+        return tuple([self.resolvers[key] for key in keys])
+
+    def __getstate__(self):
+        # resolvers are closures, so they are compiled again after loading
+        return None, {'initialized': self.initialized,
+                      'schemas': self.schemas}
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        object.__setattr__(self, 'compiler', None)
+        object.__setattr__(self, 'resolvers', dict())
+        object.__setattr__(self, 'problems', dict())
+
+
+class Parameter(Immutable):
+    """ Parent class of the parameters of scene texts.
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, schema):
+        super().__init__()
+        self.key = schema['key']
+
+    @abstractmethod
+    def compile(self, compiler):
+        """ Returns a resolver, a closure that takes a state function and a
+        ConditionMemo and returns the text of this parameter.
+        """
+        pass
+
+    @staticmethod
+    def construct(schema):
+        try:
+            constructor = _parameter_constructors[schema.get('type')]
+        except KeyError:
+            raise SchemaError("unknown parameter type ``{0}``".format(
+                schema.get('type')), schema=schema)
+        try:
+            return constructor(schema)
+        except KeyError as e:
+            raise SchemaError("missing required field ``{0}``".format(
+                e.args[0]), schema=schema)
+
+
+class ReferenceParameter(Parameter):
+    """ A parameter naming something of the player's, such as their weapon.
+    ``ref`` is a string in the pc state; until the world declares it, its
+    name stands in for it.
+    """
+    __slots__ = ('ref',)
+
+    def __init__(self, schema):
+        super().__init__(schema)
+        self.ref = schema['ref']
+        self.initialized = True
+
+    def compile(self, compiler):
+        return _reference(self.ref, compiler)
+
+
+class ModalParameter(Parameter):
+    """ A parameter that reads ``val`` if its condition holds, and ``alt``
+    (or ``else``) otherwise.
+    """
+    __slots__ = ('condition', 'val', 'alt')
+
+    def __init__(self, schema):
+        super().__init__(schema)
+        self.condition = _condition(_field(schema, 'condition', 'if'))
+        self.val = schema['val']
+        self.alt = _field(schema, 'alt', 'else', '')
+        self.initialized = True
+
+    def compile(self, compiler):
+        return _modal(compiler.compile(self.condition),
+                      lambda get: self.val, lambda get: self.alt)
+
+
+class IndirectModalParameter(ModalParameter):
+    """ A modal parameter whose alternatives are references, like those of
+    a ReferenceParameter.
+    """
+    __slots__ = ()
+
+    def __init__(self, schema):
+        super().__init__(dict(schema, val=schema['ref']))
+
+    def compile(self, compiler):
+        return _modal(compiler.compile(self.condition),
+                      _reference(self.val, compiler),
+                      _reference(self.alt, compiler))
+
+
+class FirstMatchParameter(Parameter):
+    """ A parameter that reads the ``val`` of the first of its ``cases``
+    whose condition holds, or ``default``.
+    """
+    __slots__ = ('cases', 'default')
+
+    def __init__(self, schema):
+        super().__init__(schema)
+        try:
+            self.cases = tuple((_condition(case['if']), case['val'])
+                               for case in schema['cases'])
+        except (KeyError, TypeError):
+            raise SchemaError("every case needs an ``if`` and a ``val``",
+                              schema=schema)
+        self.default = schema.get('default', '')
+        self.initialized = True
+
+    def compile(self, compiler):
+        cases = tuple((compiler.compile(condition), val)
+                      for condition, val in self.cases)
+        default = self.default
+
+        def resolve(get, memo):
+            for condition, val in cases:
+                if memo.test(condition, get):
+                    return val
+            return default
+        return resolve
+
+
+def _field(schema, name, alias, *default):
+    if name in schema:
+        return schema[name]
+    elif alias in schema or not default:
+        return schema[alias]
+    return default[0]
+
+
+def _slot(key):
+    slot = '{' + key + '}'
+    return lambda get, memo=None: slot
+
+
+def _reference(ref, compiler):
+    path = 'pc.strings.' + ref
+    if compiler.symbols.declares(path):
+        path = compile_path(path)
+        return lambda get, memo=None: get(path)
+    name = ref.replace('_', ' ')
+    return lambda get, memo=None: name
+
+
+def _modal(condition, val, alt):
+    def resolve(get, memo):
+        if memo.test(condition, get):
+            return val(get)
+        return alt(get)
+    return resolve
+
+
+def _condition(schema):
+    """ Parses the condition of a text parameter. These are conditional
+    trees, in which a mapping of ``pc`` or ``game`` to a name also stands for
+    that flag of the pc or game state, and ``not`` negates a flag.
+    """
+    return conditional.parse(_expand(schema))
+
+
+def _expand(schema):
+    if type(schema) == str:
+        return schema
+    elif type(schema) == list:
+        return [_expand(item) for item in schema]
+    elif type(schema) == dict and len(schema) == 1:
+        (key, value), = schema.items()
+        if key in ('any', 'all'):
+            return {key: _expand(value)}
+        elif key in ('pc', 'game') and type(value) == str:
+            return '{0}.flags.{1}'.format(key, value)
+        elif key == 'not':
+            value = _expand(value)
+            if type(value) == str and ' ' not in value:
+                return '! ' + value
+    raise SchemaError("condition ``{0}`` is of an unsupported form"
+                      .format(schema), schema=schema)
+
+
+_parameter_constructors = {
+    'possession_name': ReferenceParameter,
+    'reference': ReferenceParameter,
+    'modal': ModalParameter,
+    'indirect_modal': IndirectModalParameter,
+    'first_match': FirstMatchParameter,
+}
@@ -0,0 +1,122 @@
+import glob
+import hashlib
+import mmap
+import os
+
+from coc import COCClass
+
+# arenas already mapped by this process, keyed by path, so that every handle
+# unpickled from a bundle or store shares one mapping
+_arenas = dict()
+
+
+class TextArena(COCClass):
+    """ A read-only memory map of a file of UTF-8 text. Arena files are never
+    modified once written, so every process that loads the same world shares
+    their pages through the OS page cache.
+    """
+    def __init__(self, arena_file):
+        super().__init__()
+        self.arena_file = arena_file
+        with open(arena_file, 'rb') as file:
+            if os.fstat(file.fileno()).st_size:
+                self.map = mmap.mmap(file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+            else:
+                # empty files can't be mapped
+                self.map = b''
+
+    def get(self, offset, length):
+        return self.map[offset:offset + length].decode('utf-8')
+
+
+class TextHandle(COCClass):
+    """ Stands in for a string stored in a TextArena, and only decodes it
+    when it is converted with str().
+    """
+    __slots__ = ('arena_file', 'offset', 'length')
+
+    def __init__(self, arena_file, offset, length):
+        self.arena_file = arena_file
+        self.offset = offset
+        self.length = length
+
+    def __str__(self):
+        return open_arena(self.arena_file).get(self.offset, self.length)
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __reduce__(self):
+        return _restore_handle, (self.arena_file, self.offset, self.length)
+
+
+class ArenaBuilder(COCClass):
+    """ Collects strings for a new TextArena. Identical strings are stored
+    once, however many objects they come from.
+    """
+    def __init__(self, arena_dir, prefix):
+        super().__init__()
+        self.arena_dir = arena_dir
+        self.prefix = prefix
+        self.chunks = list()
+        self.offsets = dict()
+        self.size = 0
+        self.handles = list()
+
+    def add(self, text):
+        """ Returns a TextHandle for ``text``. The handle only becomes usable
+        once write() has been called.
+        """
+        if text not in self.offsets:
+            encoded = text.encode('utf-8')
+            self.offsets[text] = (self.size, len(encoded))
+            self.chunks.append(encoded)
+            self.size += len(encoded)
+        handle = TextHandle(None, *self.offsets[text])
+        self.handles.append(handle)
+        return handle
+
+    def write(self):
+        """ Writes the arena to a file named after its content, so arenas are
+        never overwritten while another process has them mapped, and points
+        every handle returned by add() at it. Older arenas with the same
+        prefix are removed; processes that still map them keep their pages.
+        """
+        data = b''.join(self.chunks)
+        arena_file = os.path.join(self.arena_dir, '{0}-{1}{2}text'.format(
+            self.prefix, hashlib.sha256(data).hexdigest()[:16], os.extsep))
+        if not os.path.exists(arena_file):
+            os.makedirs(self.arena_dir, exist_ok=True)
+            tmp_file = arena_file + os.extsep + 'tmp'
+            with open(tmp_file, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_file, arena_file)
+        for handle in self.handles:
+            handle.arena_file = arena_file
+        for stale_file in glob.glob(os.path.join(
+                self.arena_dir, glob.escape(self.prefix) + '-*.text')):
+            if stale_file != arena_file:
+                os.remove(stale_file)
+        return arena_file
+
+
+def open_arena(arena_file):
+    try:
+        return _arenas[arena_file]
+    except KeyError:
+        arena = _arenas[arena_file] = TextArena(arena_file)
+        return arena
+
+
+def _restore_handle(arena_file, offset, length):
+    # map the arena while unpickling, so a missing arena fails the load of
+    # the bundle rather than the first print of its text
+    open_arena(arena_file)
+    return TextHandle(arena_file, offset, length)
@@ -1,14 +1,15 @@
+import sys
 from copy import deepcopy
 
-from coc.world.locale import Locale, register_locale
-from coc.world.eventstream import is_eventstream_loaded
-from coc.exceptions import ObjectNotFoundError, SchemaError
+from coc.world.locale import Locale
+from coc.exceptions import SchemaError
 
 
 class Town(Locale):
     """ Represents a peaceful, visitable location with one or more selectable
     events as stores, NPCs, etc.
     """
+    __slots__ = ()
 
     def __init__(self, schema):
         def load_flags():
@@ -89,14 +90,7 @@ class Town(Locale):
             events = list()
             try:
                 for event_id in schema['state']['events']:
-                    if not is_eventstream_loaded(event_id):
-                        raise ObjectNotFoundError(
-                            "tried to load town object (id ``{0}``) with a "
-                            "nonexistant event_id in its event registry - "
-                            "requested id was ``{1}``"
-                            .format(self.id_, event_id),
-                            schema=schema)
-                    events.append(event_id)
+                    events.append(sys.intern(event_id))
             except KeyError as e:
                 if e.args[0] == 'events':
                     raise SchemaError(
@@ -113,7 +107,6 @@ class Town(Locale):
         self.state['strings'] = load_strings()
         self.state['events'] = load_events()
         self.initialized = True
-        register_locale(self.id_, self)
 
     def get_state_template(self):
         return deepcopy(self.state)
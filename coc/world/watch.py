@@ -0,0 +1,94 @@
+import glob
+import os
+import threading
+
+import yaml
+
+from coc import COCClass
+from coc.world import _parse_file
+
+
+class WorldWatcher(COCClass):
+    """ Watches the schema files of a World for changes, by polling their
+    modification times on a background thread. Changed files are re-parsed on
+    that thread and staged, and apply() swaps them into the World. apply()
+    should be called from the thread that runs the game, between events.
+    """
+    def __init__(self, world, interval=0.5):
+        super().__init__()
+        self.world = world
+        self.interval = interval
+        self.mtimes = self._scan()
+        self.pending = dict()
+        self.errors = dict()
+        self.lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def poll(self):
+        """ Checks the schema files once, and stages any that were added,
+        changed or removed since the last check.
+        """
+        mtimes = self._scan()
+        changes = dict()
+        errors = dict()
+        for path, mtime in mtimes.items():
+            if self.mtimes.get(path) != mtime:
+                try:
+                    changes[path] = _parse_file(path)
+                except (OSError, yaml.YAMLError) as e:
+                    errors[path] = e
+        for path in self.mtimes:
+            if path not in mtimes:
+                changes[path] = None
+        with self.lock:
+            self.pending.update(changes)
+            for path in changes:
+                self.errors.pop(path, None)
+            self.errors.update(errors)
+        # files that failed to parse keep their modification time, so they
+        # are parsed again, and their error reported again, only once they
+        # are changed
+        self.mtimes = mtimes
+
+    def apply(self):
+        """ Reloads all staged files into the World, and returns the paths
+        that were reloaded. Raises the error of the first staged file that
+        could not be parsed, or of the first object that failed to load; in
+        the latter case the World is left unchanged, and the files are
+        staged again on their next modification.
+        """
+        with self.lock:
+            changes = self.pending
+            self.pending = dict()
+            errors = self.errors
+            self.errors = dict()
+        if changes:
+            self.world.reload(changes)
+        for path in sorted(errors):
+            raise errors[path]
+        return sorted(changes)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def _scan(self):
+        mtimes = dict()
+        for pattern in list(self.world.source_globs):
+            for path in glob.glob(pattern):
+                try:
+                    mtimes[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    pass
+        return mtimes
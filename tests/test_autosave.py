@@ -0,0 +1,53 @@
+import tempfile
+import time
+import unittest
+
+from coc.player import Player, saves
+
+try:
+    from coc.session.autosave import Autosaver
+except ImportError:
+    # sessions need the terminal interface
+    Autosaver = None
+
+
+@unittest.skipIf(Autosaver is None, "the session package can't be imported")
+class IntervalTest(unittest.TestCase):
+    """ Autosaves due some time after the first unsaved change.
+    """
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.saves = saves.open_store(tmp.name)
+        self.player = Player('bob', 'world',
+                             {'pc': {'counters': {'gems': 0}}}, {})
+        self.saves.save(self.player)
+
+    def saved_gems(self):
+        return self.saves.load('bob').get_state('pc.counters.gems')
+
+    def test_saved_while_waiting(self):
+        autosaver = Autosaver(self.player, self.saves, interval=0.2).start()
+        self.addCleanup(autosaver.close)
+        self.player.set_state('pc.counters.gems', 5)
+        autosaver.notify()
+        self.assertEqual(self.saved_gems(), 0)
+        # the game waits on the player, so notify() isn't called again
+        time.sleep(0.6)
+        self.assertEqual(self.saved_gems(), 5)
+
+    def test_due_after_first_change(self):
+        autosaver = Autosaver(self.player, self.saves, interval=0.3).start()
+        self.addCleanup(autosaver.close)
+        self.player.set_state('pc.counters.gems', 5)
+        autosaver.notify()
+        time.sleep(0.15)
+        # later changes don't put off the save of the first one
+        self.player.set_state('pc.counters.gems', 6)
+        autosaver.notify()
+        time.sleep(0.35)
+        self.assertEqual(self.saved_gems(), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from coc.exceptions import COCException, SchemaError
+from coc.player import Player
+from coc.world import conditional
+
+
+class UnsetStateTest(unittest.TestCase):
+    """ Conditions on state the game hasn't set yet.
+    """
+    def setUp(self):
+        self.player = Player('bob', 'world', {'pc': {}, 'game': {}}, {})
+        self.compiler = conditional.Compiler(self.player.state.symbols)
+
+    def check(self, condition, expected):
+        expr = conditional.parse(condition)
+        self.assertIs(expr.test(self.player.get_state), expected)
+        compiled = self.compiler.compile(expr)
+        self.assertIs(self.player.conditions.test(
+            compiled, self.player.get_state), expected)
+
+    def test_flags(self):
+        self.check('game.flags.met_kiha', False)
+        self.check('! game.flags.met_kiha', True)
+
+    def test_counters(self):
+        self.check('game.counters.x > 3', False)
+        self.check('game.counters.x < 3', True)
+
+    def test_strings(self):
+        self.check('game.strings.name = game.strings.name', True)
+        with self.assertRaises(COCException):
+            conditional.parse('game.strings.name > 3').test(
+                self.player.get_state)
+
+
+class OperandTest(unittest.TestCase):
+    """ Conditions comparing values their operator can't take.
+    """
+    def setUp(self):
+        self.player = Player('bob', 'world', {
+            'pc': {'strings': {'name': 'bob'}}, 'game': {}}, {})
+        self.compiler = conditional.Compiler(self.player.state.symbols)
+
+    def test_state(self):
+        expr = conditional.parse('pc.strings.name > 3')
+        with self.assertRaises(COCException):
+            expr.test(self.player.get_state)
+        compiled = self.compiler.compile(expr)
+        with self.assertRaises(COCException):
+            compiled.test(self.player.get_state)
+
+    def test_literals(self):
+        with self.assertRaises(SchemaError):
+            self.compiler.compile(conditional.parse('foo > 3'))
+
+
+if __name__ == '__main__':
+    unittest.main()
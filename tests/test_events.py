@@ -0,0 +1,41 @@
+import os
+import unittest
+
+from coc import world
+from coc.exceptions import StateNotFoundError
+from coc.player import Player
+from coc.player.statestore import StateStore
+
+WORLD_SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, 'classic')
+
+
+class RegistrationTest(unittest.TestCase):
+    """ The index of where players register event streams.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.world = world.load(WORLD_SCHEMA)
+
+    def setUp(self):
+        self.player = Player('bob', self.world.get_id(), {
+            'pc': StateStore(self.world.symbols).to_dict()['pc'],
+            'game': {}}, {}, self.world.symbols)
+
+    def test_rejected_value(self):
+        path = 'world.locale.camp.events'
+        registered = self.player.get_state(path)
+        contexts = self.player.event_contexts('at_camp')
+        with self.assertRaises(StateNotFoundError):
+            self.player.set_state(path, 5)
+        self.assertEqual(self.player.get_state(path), registered)
+        self.assertEqual(self.player.event_contexts('at_camp'), contexts)
+
+    def test_registered(self):
+        self.player.event_contexts('at_camp')
+        self.player.set_state('world.locale.camp.events', ['_gen_character'])
+        self.assertNotIn(('locale', 'camp'),
+                         self.player.event_contexts('at_camp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
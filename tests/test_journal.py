@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from coc import player as playerlib
+from coc.player import Player, journal
+
+
+class CompactionTest(unittest.TestCase):
+    """ A crash while a journaled save is compacted into a new snapshot.
+    """
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.save_file = os.path.join(tmp.name, 'bob.csf')
+
+    def check(self, binary):
+        player = Player('bob', 'world', {'pc': {'counters': {'gems': 0}}},
+                        {})
+        player.save(self.save_file, journal=True, binary=binary)
+        for gems in (5, 6):
+            player.set_state('pc.counters.gems', gems)
+            player.save(self.save_file, journal=True, binary=binary)
+        self.assertEqual(playerlib.load(self.save_file).get_state(
+            'pc.counters.gems'), 6)
+        # a rolled back game is compacted, and the crash leaves the journal
+        # of the replaced snapshot behind
+        player.set_state('pc.counters.gems', 2)
+        player.rolled_back = True
+        with mock.patch.object(journal, 'clear'):
+            player.save(self.save_file, journal=True, binary=binary)
+        loaded = playerlib.load(self.save_file)
+        self.assertEqual(loaded.get_state('pc.counters.gems'), 2)
+        loaded.set_state('pc.counters.gems', 3)
+        loaded.save(self.save_file, journal=True, binary=binary)
+        self.assertEqual(playerlib.load(self.save_file).get_state(
+            'pc.counters.gems'), 3)
+
+    def test_binary(self):
+        self.check(binary=True)
+
+    def test_yaml(self):
+        self.check(binary=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
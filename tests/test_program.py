@@ -0,0 +1,50 @@
+import os
+import unittest
+
+from coc import world
+from coc.exceptions import COCException
+from coc.player import Player
+from coc.player.statestore import StateStore
+from coc.world.program import Program
+
+WORLD_SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, 'classic')
+
+
+class FailingInterface:
+    """ An interface that fails once it is asked to print ``text``.
+    """
+    def __init__(self, text):
+        self.text = text
+
+    def print(self, text, *args, **kwargs):
+        if text == self.text:
+            raise COCException("unable to print ``{0}``".format(text))
+
+
+class ChainTest(unittest.TestCase):
+    """ Streams that run on into the stream they branch to.
+    """
+    def setUp(self):
+        self.world = world.load(WORLD_SCHEMA)
+        self.player = Player('bob', self.world.get_id(), {
+            'pc': StateStore(self.world.symbols).to_dict()['pc'],
+            'game': {}}, {}, self.world.symbols)
+        self.program = Program(self.world)
+
+    def test_enter(self):
+        entered = list()
+        # _gen_character ends by branching to discover_camp
+        with self.assertRaises(COCException):
+            self.program.run(self.program.address('_gen_character'),
+                             self.player,
+                             FailingInterface("Kiha is here!"), list(),
+                             list(), entered.append)
+        self.assertEqual([self.program.stream_at(address)
+                          for address in entered],
+                         ['_gen_character', 'discover_camp'])
+        self.assertEqual(self.program.stream_at(self.program.current),
+                         'discover_camp')
+
+
+if __name__ == '__main__':
+    unittest.main()
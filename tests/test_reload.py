@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from coc import world
+from coc.player import Player
+from coc.world.watch import WorldWatcher
+
+WORLD_SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, 'classic')
+
+
+class RebindTest(unittest.TestCase):
+    """ A player moved over to a world reloaded while it was played.
+    """
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.schema_path = os.path.join(tmp.name, 'classic')
+        shutil.copytree(WORLD_SCHEMA, self.schema_path)
+
+    def test_world_id(self):
+        w = world.load(self.schema_path)
+        player = Player('bob', w.get_id(), {'pc': {}, 'game': {}},
+                        {'world_objects': w.get_object_hashes()}, w.symbols)
+        camp = os.path.join(self.schema_path, 'locales', 'camp.yaml')
+        with open(camp) as file:
+            schema = file.read()
+        with open(camp, 'w') as file:
+            file.write(schema.replace('    - development_stage\n',
+                                      '    - development_stage\n'
+                                      '    - fires_lit\n', 1))
+        # the watcher goes by modification times
+        mtime = time.time() + 10
+        os.utime(camp, (mtime, mtime))
+        watcher = WorldWatcher(w)
+        watcher.mtimes[camp] = 0
+        watcher.poll()
+        watcher.apply()
+        player.rebind(w)
+        reloaded = world.load(self.schema_path)
+        self.assertEqual(player.world_id, reloaded.get_id())
+        self.assertEqual(player.meta['world_objects'],
+                         reloaded.get_object_hashes())
+        self.assertEqual(player.get_state(
+            'world.locale.camp.counters.fires_lit'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
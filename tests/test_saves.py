@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from coc import world
+from coc.player import Player, savefile, saves
+from coc.player.statestore import StateStore
+
+WORLD_SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, 'classic')
+
+
+class MigrateTest(unittest.TestCase):
+    """ Migrating the save files of a save path into its SQLite store.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.world = world.load(WORLD_SCHEMA)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.save_path = tmp.name
+        # a save as the first releases wrote them: the whole state as YAML,
+        # without meta data, indexed by saves.yaml
+        state = self.world.get_state_template()
+        state['pc'] = StateStore(self.world.symbols).to_dict()['pc']
+        state['pc']['counters']['gems'] = 42
+        state['game'] = dict()
+        save_file = os.path.join(self.save_path, 'bob.csf')
+        with open(save_file, 'w') as file:
+            file.write(yaml.safe_dump({
+                'name': 'bob', 'world_id': self.world.get_id(),
+                'state': state, 'meta': None}))
+        with open(os.path.join(self.save_path, 'saves.yaml'), 'w') as file:
+            file.write(yaml.safe_dump({'bob': save_file}))
+
+    def migrate(self, world_=None, skipped=()):
+        target = saves.open_store(self.save_path, 'sqlite')
+        migrated, skipped_ = saves.migrate(
+            saves.open_store(self.save_path, 'files'), target, world_)
+        self.assertEqual(migrated, ['bob'])
+        self.assertEqual([name for name, _ in skipped_], list(skipped))
+        return target
+
+    def record(self, target):
+        """ Returns the header and section names of a migrated save.
+        """
+        data, = target._connection().execute(
+            'SELECT save FROM players WHERE name = ?', ('bob',)).fetchone()
+        header, sections = savefile.parse(data)
+        return header, set(sections)
+
+    def test_baseline_save(self):
+        target = self.migrate(self.world)
+        header, = target.list()
+        self.assertEqual(header['world_id'], self.world.get_id())
+        # stored as changes to the world: only the scopes the save changed
+        header, sections = self.record(target)
+        self.assertTrue(header['delta'])
+        self.assertEqual(sections, {'meta', 'pc'})
+        player = target.load('bob', self.world.symbols)
+        self.assertEqual(player.get_state('pc.counters.gems'), 42)
+        self.assertGreaterEqual(player.get_playtime(), 0.0)
+        target.close()
+
+    def test_baseline_save_without_world(self):
+        target = self.migrate()
+        header, sections = self.record(target)
+        self.assertFalse(header['delta'])
+        player = target.load('bob')
+        self.assertEqual(player.get_state('pc.counters.gems'), 42)
+        target.close()
+
+    def test_save_of_another_world(self):
+        # only the world it changes could load this save
+        player = Player('eve', 'another world', {'pc': {}, 'game': {}},
+                        {}, self.world.symbols)
+        saves.open_store(self.save_path, 'files').save(player)
+        target = self.migrate(self.world, skipped=['eve'])
+        self.assertFalse(target.exists('eve'))
+        target.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
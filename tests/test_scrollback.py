@@ -0,0 +1,41 @@
+import textwrap
+import unittest
+
+try:
+    from tui.scrollback import Scrollback
+except ImportError:
+    # the tui package needs a terminal library
+    Scrollback = None
+
+
+@unittest.skipIf(Scrollback is None, "the tui package can't be imported")
+class WindowTest(unittest.TestCase):
+    """ Windows of wrapped lines, scrolled back from the last one.
+    """
+    def setUp(self):
+        self.wrapper = textwrap.TextWrapper(width=10)
+        self.scrollback = Scrollback(self.wrapper, max_chars=60)
+        # two lines each
+        for i in range(4):
+            self.scrollback.append('p{0} aaaa bbbb cccc'.format(i))
+
+    def test_dropped(self):
+        # only the last three paragraphs fit
+        self.assertEqual(self.scrollback.line_count(), 6)
+        self.assertEqual(self.scrollback.window(5, 5), ['p1 aaaa'])
+
+    def test_window(self):
+        self.assertEqual(self.scrollback.window(2, 3),
+                         ['bbbb cccc', 'p2 aaaa', 'bbbb cccc'])
+        self.assertEqual(self.scrollback.window(0, 2),
+                         ['bbbb cccc', 'p3 aaaa'])
+
+    def test_resized(self):
+        self.wrapper.width = 20
+        self.assertEqual(self.scrollback.line_count(), 3)
+        self.assertEqual(self.scrollback.window(1, 5),
+                         ['p2 aaaa bbbb cccc', 'p1 aaaa bbbb cccc'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from coc.exceptions import StateNotFoundError
+from coc.player import Player
+from coc.world.symbols import SymbolTable
+
+STATE = {'pc': {'counters': {'gems': 0}, 'strings': {'name': 'bob'}}}
+
+
+class StringTest(unittest.TestCase):
+    """ Strings players store that the world doesn't declare as defaults.
+    """
+    def setUp(self):
+        self.symbols = SymbolTable(STATE)
+
+    def player(self):
+        return Player('bob', 'world', STATE, {}, self.symbols)
+
+    def test_not_shared(self):
+        table = list(self.symbols.string_values)
+        alice, eve = self.player(), self.player()
+        alice.set_state('pc.strings.name', 'alice')
+        eve.set_state('pc.strings.name', 'eve')
+        self.assertEqual(self.symbols.string_values, table)
+        self.assertEqual(alice.get_state('pc.strings.name'), 'alice')
+        self.assertEqual(eve.get_state('pc.strings.name'), 'eve')
+
+    def test_snapshot(self):
+        player = self.player()
+        player.set_state('pc.strings.name', 'alice')
+        checkpoint = player.checkpoint()
+        player.set_state('pc.strings.name', 'eve')
+        player.restore(checkpoint)
+        self.assertEqual(player.get_state('pc.strings.name'), 'alice')
+        self.assertEqual(player.state.scope_delta(('pc',)),
+                         {'strings': {'name': 'alice'}})
+        player.set_state('pc.strings.name', 'bob')
+        self.assertEqual(player.state.scope_delta(('pc',)), dict())
+
+
+class CounterTest(unittest.TestCase):
+    """ Values a counter can't hold.
+    """
+    def test_rejected(self):
+        player = Player('bob', 'world', STATE, {})
+        player.set_state('pc.counters.gems', 3.0)
+        for value in (2.7, None):
+            with self.assertRaises(StateNotFoundError):
+                player.set_state('pc.counters.gems', value)
+        self.assertEqual(player.get_state('pc.counters.gems'), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
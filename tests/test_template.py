@@ -0,0 +1,37 @@
+import os
+import unittest
+
+from coc import world
+from coc.player import Player
+from coc.player.statestore import StateStore
+from coc.world.event import EventText
+
+WORLD_SCHEMA = os.path.join(os.path.dirname(__file__), os.pardir, 'classic')
+
+
+class UnresolvedParameterTest(unittest.TestCase):
+    """ Scene texts with parameters that read state the world doesn't
+    declare.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.world = world.load(WORLD_SCHEMA)
+
+    def test_reported_on_load(self):
+        self.assertIn('gender_slur', dict(
+            self.world.get_unresolved_parameters())['kiha_first_encounter'])
+
+    def test_renders_slot(self):
+        player = Player('bob', self.world.get_id(), {
+            'pc': StateStore(self.world.symbols).to_dict()['pc'],
+            'game': {}}, {}, self.world.symbols)
+        stream = self.world.get_eventstream_by_id('kiha_first_encounter')
+        text = next(item for item in stream.events
+                    if isinstance(item, EventText) and item.template and
+                    'gender_slur' in item.template.keys)
+        self.assertIn('{gender_slur}',
+                      text.template.render(player, self.world))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,8 @@ from blessed import Terminal
 
 from coc.exceptions import InterfaceException, InterfaceAPIError, \
     ExitMenuException
+from tui.frame import Frame
+from tui.scrollback import Scrollback
 
 t = Terminal()
 w = textwrap.TextWrapper(fix_sentence_endings=True)
@@ -11,7 +13,10 @@ _pause_sequence = False
 in_fullscreen = True
 window_height = 0
 window_width = 0
-_screenbuffer = ''
+_scrollback = Scrollback(w)
+# what is drawn on the screen, written out once per input
+_frame = Frame(sys.stdout, t.move, t.clear_eol, t.clear, t.hide_cursor,
+               t.normal_cursor)
 
 
 def _fullscreen(func):
@@ -21,6 +26,7 @@ def _fullscreen(func):
             return func(*args, **kwargs)
         except InterfaceException:
             if in_fullscreen:
+                _frame.flush()
                 _echo(t.exit_fullscreen)
                 in_fullscreen = False
             raise
@@ -33,12 +39,12 @@ def _get_geometry():
     window_height = t.height - 6
     window_width = t.width - 4
     w.width = window_width
+    _frame.resize(t.height, t.width)
 
 
 def _dump_buffer(func):
     def _decorator(*args, **kwargs):
-        global _screenbuffer
-        _screenbuffer = ''
+        _scrollback.clear()
         return func(*args, **kwargs)
     return _decorator
 
@@ -46,8 +52,7 @@ def _dump_buffer(func):
 def _clean_up_errors(func):
     def _decorator(*args, **kwargs):
         ret = func(*args, **kwargs)
-        with t.location(3, t.height-1):
-            _echo(t.clear_eol)
+        _frame.put(3, t.height-1, '')
         return ret
     return _decorator
 
@@ -58,6 +63,7 @@ class Interface:
     def __init__(self):
         _echo(t.enter_fullscreen)
         _get_geometry()
+        _frame.invalidate()
 
     @_fullscreen
     @_dump_buffer
@@ -69,23 +75,17 @@ class Interface:
         lines = window_height
         if clear_title:
             self.title('')
-        with t.hidden_cursor():
-            while lines:
-                with t.location(y=lines+1, x=3):
-                    _echo(t.clear_eol)
-                lines -= 1
+        while lines:
+            _frame.put(3, lines+1, '')
+            lines -= 1
 
     @_fullscreen
     def error(self, text):
-        with t.location(3, t.height-1):
-            _echo(t.clear_eol())
-            _echo(text)
+        _frame.put(3, t.height-1, text)
 
     @_fullscreen
     def title(self, text):
-        with t.location(3, 0):
-            _echo(t.clear_eol())
-            _echo(t.bold(text))
+        _frame.put(3, 0, t.bold(text) if text else '')
 
     @_fullscreen
     def prompt(self, text):
@@ -94,50 +94,41 @@ class Interface:
             text = text[:window_width - 4]
         except IndexError:
             pass
-        with t.location(3, t.height-3):
-            _echo(t.clear_eol())
-            _echo(text)
+        _frame.put(3, t.height-3, text)
 
     @_fullscreen
     def print(self, text=None, pause=True, buffer='use'):
-        global _screenbuffer
         global window_height
         if buffer not in ['ignore', 'use', 'flush']:
             raise InterfaceAPIError(
                 "Interface.print() optional kwarg ``buffer`` only takes the "
                 "values 'use', 'ignore', 'flush'")
         if buffer == 'flush':
-            _screenbuffer = ''
+            _scrollback.clear()
+        # wrapped lines are only cached until the terminal is resized
+        _get_geometry()
         if pause:
             self.prompt('press SPACE to continue')
         self.blank_window()
         offset = 0
-        lines = list()
+        scrollback = _scrollback
         if text:
             if buffer == 'ignore':
-                for line in text.splitlines():
-                    lines.extend(w.wrap(line))
-            else:
-                _screenbuffer = _screenbuffer + '\n\n' + text
-                for line in _screenbuffer.splitlines():
-                    lines.extend(w.wrap(line))
-        else:
-            for line in _screenbuffer.splitlines():
-                lines.extend(w.wrap(line))
-        lines.reverse()
+                scrollback = Scrollback(w)
+            scrollback.append(text)
         while True:
             y = window_height+1
-            for item in lines[offset:window_height+offset]:
-                with t.location(x=3, y=y):
-                    _echo(t.clear_eol)
-                    _echo(item)
+            for item in scrollback.window(offset, window_height):
+                _frame.put(3, y, item)
                 y -= 1
             if pause:
                 c = '_'
                 while c not in ' +-':
                     c = self.get_char()
                 if c == '+':
-                    offset = min(offset + 3, len(lines) - window_height)
+                    offset = max(0, min(
+                        offset + 3,
+                        scrollback.line_count() - window_height))
                 elif c == '-':
                     offset = max(0, offset - 3)
                 else:
@@ -163,9 +154,7 @@ class Interface:
                         ' + to scroll down.')
             y = 2
             for item in rendered:
-                with t.location(x=5, y=y):
-                    _echo(t.clear_eol)
-                    _echo(item)
+                _frame.put(5, y, item)
                 y += 1
         global window_height
         offset = 0
@@ -227,11 +216,10 @@ class Interface:
             self.title(title)
         if text:
             self.print(text, pause=False, buffer='flush')
-        with t.location(1, window_height+4):
-            _echo(t.clear_eol())
-            with t.hidden_cursor():
-                with t.cbreak():
-                    c = t.getch()
+        _frame.put(1, window_height+4, '')
+        _frame.flush(cursor=(window_height+4, 1), visible=False)
+        with t.cbreak():
+            c = t.getch()
         return c
 
     @_fullscreen
@@ -240,9 +228,11 @@ class Interface:
             self.prompt(prompt)
         if title:
             self.title(title)
-        with t.location(1, window_height+4):
-            _echo(t.clear_eol())
-            line = input()
+        _frame.put(1, window_height+4, '')
+        _frame.flush(cursor=(window_height+4, 1))
+        line = input()
+        # the line was echoed onto the screen
+        _frame.invalidate(window_height+4)
         return line
 
     @_fullscreen
@@ -266,14 +256,15 @@ class Interface:
         if text:
             self.print(text, pause=False, buffer='ignore')
         while True:
-            with t.location(1, window_height+4):
-                _echo(t.clear_eol())
-                raw = sys.stdin.readline().strip()
-                try:
-                    q = float(raw) if is_float else int(raw)
-                except ValueError:
-                    self.error("That's not a number!")
-                    continue
+            _frame.put(1, window_height+4, '')
+            _frame.flush(cursor=(window_height+4, 1))
+            raw = sys.stdin.readline().strip()
+            _frame.invalidate(window_height+4)
+            try:
+                q = float(raw) if is_float else int(raw)
+            except ValueError:
+                self.error("That's not a number!")
+                continue
             if q > max_:
                 if autoround:
                     return max_
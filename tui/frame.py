@@ -0,0 +1,122 @@
+ESCAPE = '\x1b'
+
+
+class Frame:
+    """ A model of the terminal screen as rows of text, each drawn from a
+    column to the end of the line. Drawing only changes the model; flush()
+    compares it with the frame last shown and writes what changed in one
+    buffered write. ``writes`` and ``bytes_written`` count what has been
+    written.
+    """
+    __slots__ = ('stream', 'move', 'clear_eol', 'clear_screen', 'cursor',
+                 'rows', 'shown', 'visible', 'size', 'writes',
+                 'bytes_written')
+
+    def __init__(self, stream, move, clear_eol, clear_screen, hide_cursor,
+                 show_cursor):
+        """ ``move`` takes a row and a column and returns the sequence moving
+        the cursor there. The other arguments are the sequences clearing the
+        rest of the line and the whole screen, and hiding and showing the
+        cursor.
+        """
+        self.stream = stream
+        self.move = move
+        self.clear_eol = clear_eol
+        self.clear_screen = clear_screen
+        self.cursor = {False: hide_cursor, True: show_cursor}
+        # rows by line, as (column, text) pairs; blank rows are left out
+        self.rows = dict()
+        # the rows on the screen, or None if the screen is in an unknown
+        # state
+        self.shown = None
+        self.visible = True
+        self.size = None
+        self.writes = 0
+        self.bytes_written = 0
+
+    def put(self, x, y, text):
+        """ Draws ``text`` from column ``x`` of row ``y``, clearing whatever
+        was on the row before.
+        """
+        if text:
+            self.rows[y] = (x, text)
+        else:
+            self.rows.pop(y, None)
+
+    def resize(self, height, width):
+        """ Drops rows below a new ``height``, and redraws the whole screen
+        on the next flush if the terminal changed size.
+        """
+        if self.size != (height, width):
+            self.size = height, width
+            self.shown = None
+            for y in [y for y in self.rows if y >= height]:
+                del self.rows[y]
+
+    def invalidate(self, y=None):
+        """ Redraws row ``y``, or the whole screen, on the next flush, after
+        something else has written to it.
+        """
+        if y is None or self.shown is None:
+            self.shown = None
+        else:
+            # a row that differs from any drawn one, which is cleared from
+            # its first column
+            self.shown[y] = (0, None)
+
+    def flush(self, cursor=None, visible=True):
+        """ Writes the changes since the last flush, then moves the cursor to
+        the ``(row, column)`` ``cursor``, if given, and shows or hides it.
+        """
+        out = list()
+        shown = self.shown
+        if shown is None:
+            out.append(self.clear_screen)
+            shown = dict()
+        move = self.move
+        clear_eol = self.clear_eol
+        rows = self.rows
+        for y in shown.keys() - rows.keys():
+            out.append(move(y, shown[y][0]))
+            out.append(clear_eol)
+        for y, row in rows.items():
+            old = shown.get(y)
+            if row == old:
+                continue
+            x, text = row
+            if old is None:
+                out.append(move(y, x))
+                out.append(text)
+                continue
+            old_x, old_text = old
+            if old_x != x or old_text is None:
+                out.append(move(y, min(x, old_x)))
+                out.append(clear_eol)
+                out.append(move(y, x))
+                out.append(text)
+                continue
+            # only rewrite the row from the first changed column on
+            same = 0
+            if ESCAPE not in text and ESCAPE not in old_text:
+                for a, b in zip(text, old_text):
+                    if a != b:
+                        break
+                    same += 1
+            out.append(move(y, x + same))
+            out.append(text[same:])
+            if len(text) < len(old_text) or same == 0:
+                out.append(clear_eol)
+        self.shown = dict(rows)
+        if cursor is not None:
+            out.append(move(*cursor))
+        if visible != self.visible:
+            out.append(self.cursor[visible])
+            self.visible = visible
+        if out:
+            self.write(''.join(out))
+
+    def write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+        self.writes += 1
+        self.bytes_written += len(data.encode())
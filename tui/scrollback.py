@@ -0,0 +1,129 @@
+import bisect
+
+# characters of text kept for scrolling back through
+MAX_CHARS = 1 << 20
+
+
+class Paragraph:
+    """ A line of printed text, and its wrapped lines at the width it was
+    last wrapped to.
+    """
+    __slots__ = ('text', 'width', 'lines')
+
+    def __init__(self, text):
+        self.text = text
+        self.width = None
+        self.lines = None
+
+    def wrap(self, wrapper):
+        if self.width != wrapper.width:
+            self.lines = wrapper.wrap(self.text)
+            self.width = wrapper.width
+        return self.lines
+
+
+class Scrollback:
+    """ The text printed to the screen since it was last flushed, kept as a
+    ring of paragraphs holding at most ``max_chars`` characters. Paragraphs
+    are wrapped with the TextWrapper ``wrapper`` once per width, so printing
+    only wraps the new text. The line each paragraph ends on is kept per
+    width, so drawing a window finds its first paragraph by bisection and
+    only reads the lines in it.
+    """
+    __slots__ = ('wrapper', 'max_chars', 'paragraphs', 'ends', 'first',
+                 'chars', 'width')
+
+    def __init__(self, wrapper, max_chars=MAX_CHARS):
+        self.wrapper = wrapper
+        self.max_chars = max_chars
+        self.clear()
+
+    def clear(self):
+        self.paragraphs = list()
+        # the number of wrapped lines up to the end of each paragraph, from
+        # the start of the list, dropped paragraphs included
+        self.ends = list()
+        # the first paragraph still in the ring; the ones before it are
+        # dropped, and removed from the lists once they are half of them
+        self.first = 0
+        self.chars = 0
+        # the width the line ends are of
+        self.width = self.wrapper.width
+
+    def append(self, text):
+        """ Adds ``text`` to the end of the scrollback, dropping the oldest
+        paragraphs past the size limit.
+        """
+        self._check_width()
+        paragraphs = self.paragraphs
+        ends = self.ends
+        end = ends[-1] if ends else 0
+        for line in text.splitlines():
+            if not line:
+                # blank lines wrap to nothing
+                continue
+            paragraph = Paragraph(line)
+            paragraphs.append(paragraph)
+            self.chars += len(line)
+            end += len(paragraph.wrap(self.wrapper))
+            ends.append(end)
+        while self.chars > self.max_chars and \
+                len(paragraphs) - self.first > 1:
+            self.chars -= len(paragraphs[self.first].text)
+            paragraphs[self.first] = None
+            self.first += 1
+        if self.first > len(paragraphs) // 2:
+            start = self._start()
+            del paragraphs[:self.first]
+            self.ends = [end - start for end in ends[self.first:]]
+            self.first = 0
+
+    def line_count(self):
+        """ Returns the number of wrapped lines in the scrollback.
+        """
+        self._check_width()
+        return self._end() - self._start()
+
+    def window(self, offset, height):
+        """ Returns up to ``height`` wrapped lines, ending ``offset`` lines
+        before the last one, from the bottom up.
+        """
+        self._check_width()
+        wrapper = self.wrapper
+        paragraphs = self.paragraphs
+        ends = self.ends
+        bottom = self._end() - offset
+        top = max(bottom - height, self._start())
+        lines = list()
+        if bottom <= top:
+            return lines
+        # the paragraph holding the bottom line
+        index = bisect.bisect_right(ends, bottom - 1, self.first)
+        while index >= self.first and bottom > top:
+            wrapped = paragraphs[index].wrap(wrapper)
+            start = ends[index] - len(wrapped)
+            lines.extend(reversed(wrapped[max(top, start) - start:
+                                          bottom - start]))
+            bottom = start
+            index -= 1
+        return lines
+
+    def _start(self):
+        ends = self.ends
+        return ends[self.first - 1] if self.first else 0
+
+    def _end(self):
+        return self.ends[-1] if self.ends else 0
+
+    def _check_width(self):
+        # the terminal was resized, so lines are counted again
+        if self.width != self.wrapper.width:
+            self.width = self.wrapper.width
+            end = 0
+            ends = self.ends
+            for index in range(self.first, len(self.paragraphs)):
+                end += len(self.paragraphs[index].wrap(self.wrapper))
+                ends[index] = end
+            # dropped paragraphs count for nothing at the new width
+            for index in range(self.first):
+                ends[index] = 0